@@ -7,19 +7,25 @@ from .errors.jwt_error_handler import register_jwt_error_handlers
 from .errors.error import register_error_handlers
 from app.utils.logger import setup_logging
 from .models import db
-from flask_migrate import Migrate
-
-blacklisted_tokens = set()
-
-def create_app():
+from app.utils.rate_limiter import limiter
+from app.utils.identity_cache import identity_cache
+from app.utils.sharding import shards
+from app.utils.compression import init_compression
+from app.utils.revocation import revocations
+from .cli import register_commands
+
+def create_app(config_object=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_object)
 
     setup_logging(app)
    
     db.init_app(app)
-    migrate = Migrate(app, db)
+    shards.init_app(app)
     jwt = JWTManager(app)
+    limiter.init_app(app)
+    identity_cache.init_app(app)
+    revocations.init_app(app)
     CORS(app, origins=['http://localhost:3000'])
 
    
@@ -31,21 +37,19 @@ def create_app():
     app.register_blueprint(notes_bp, url_prefix='/api/notes')
     app.register_blueprint(health_bp, url_prefix='/api')
 
+    init_compression(app)
+
    
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
-        jti = jwt_payload['jti']
-        return jti in blacklisted_tokens
-
-   
-    app.blacklisted_tokens = blacklisted_tokens
+        return revocations.is_revoked(jwt_payload)
 
     
     register_jwt_error_handlers(app)
     register_error_handlers(app)
 
-    
-    with app.app_context():
-        db.create_all()
+    # Schema creation is an explicit step (`flask --app run init-db` or
+    # `flask --app run db upgrade`), not something every boot pays for.
+    register_commands(app)
 
     return app
@@ -0,0 +1,102 @@
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .models import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def init_migrate(app):
+    from flask_migrate import Migrate
+    Migrate(app, db, directory=MIGRATIONS_DIR)
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Apply migrations, then create any missing tables on every bind and notes shard."""
+    from flask_migrate import upgrade
+    from app.utils.sharding import shards
+
+    if 'migrate' not in current_app.extensions:
+        init_migrate(current_app)
+    # Migrations first: they bring tables created by older releases up to date
+    # and are no-ops on a fresh database, whose tables create_all() then makes.
+    upgrade()
+    db.create_all()
+    shards.create_all()
+    click.echo('Database schema is up to date.')
+
+
+@click.command('purge-accounts')
+@with_appcontext
+def purge_accounts_command():
+    """Run or resume every unfinished account deletion."""
+    from app.utils.account_purge import resume_unfinished_purges
+
+    total, failed = resume_unfinished_purges()
+    click.echo(f'Processed {total} account deletion(s), {failed} failed.')
+
+
+@click.command('reconcile-note-stats')
+@click.option('--batch-size', default=500, show_default=True, help='Users per transaction.')
+@with_appcontext
+def reconcile_note_stats_command(batch_size):
+    """Recompute user_note_stats from the notes table."""
+    from app.utils.note_stats import reconcile_note_stats
+
+    processed = reconcile_note_stats(batch_size)
+    click.echo(f'Reconciled note stats for {processed} user(s).')
+
+
+@click.command('rebalance-notes')
+@click.option('--batch-size', default=500, show_default=True, help='Rows copied per transaction.')
+@click.option('--drain', multiple=True, metavar='NAME=URI', help='Retired shard to move all rows off.')
+@click.option('--user', 'user_ids', multiple=True, help='Only move these users.')
+@with_appcontext
+def rebalance_notes_command(batch_size, drain, user_ids):
+    """Move users' notes to the shard the hash ring assigns them."""
+    from app.config import parse_shards
+    from app.utils.resharding import rebalance_shards
+
+    users, rows = rebalance_shards(
+        batch_size, drain=parse_shards(','.join(drain)), user_ids=set(user_ids) or None
+    )
+    click.echo(f'Moved {rows} row(s) for {users} user(s).')
+
+
+@click.command('purge-idempotency-keys')
+@with_appcontext
+def purge_idempotency_keys_command():
+    """Delete expired idempotency keys."""
+    from app.utils.idempotency import purge_expired
+
+    click.echo(f'Deleted {purge_expired()} expired idempotency key(s).')
+
+
+@click.command('compact-revisions')
+@click.option('--keep', type=int, default=None, help='Revisions kept per note [default: NOTE_REVISION_RETENTION].')
+@click.option('--batch-size', default=100, show_default=True, help='Notes per transaction.')
+@with_appcontext
+def compact_revisions_command(keep, batch_size):
+    """Drop note revisions beyond the retention limit."""
+    from app.utils.revisions import compact_all_revisions
+
+    click.echo(f'Deleted {compact_all_revisions(keep, batch_size)} note revision(s).')
+
+
+def register_commands(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(purge_accounts_command)
+    app.cli.add_command(reconcile_note_stats_command)
+    app.cli.add_command(rebalance_notes_command)
+    app.cli.add_command(purge_idempotency_keys_command)
+    app.cli.add_command(compact_revisions_command)
+
+    # Flask-Migrate pulls in alembic, which alone costs ~150ms of import time.
+    # Only the `flask` CLI needs the `db` command group, so skip it on normal boot.
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        init_migrate(app)
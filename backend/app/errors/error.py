@@ -19,6 +19,21 @@ def register_error_handlers(app):
     def conflict(e):
         return jsonify({'error': 'Conflict', 'message': str(e)}), 409
 
+    @app.errorhandler(413)
+    def payload_too_large(e):
+        return jsonify({'error': 'Payload Too Large', 'message': str(e)}), 413
+
+    @app.errorhandler(415)
+    def unsupported_media_type(e):
+        return jsonify({'error': 'Unsupported Media Type', 'message': str(e)}), 415
+
+    @app.errorhandler(429)
+    def too_many_requests(e):
+        response = jsonify({'error': 'Too Many Requests', 'message': str(e)})
+        if getattr(e, 'retry_after', None):
+            response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+
     @app.errorhandler(500)
     def internal_error(e):
         return jsonify({'error': 'Internal Server Error', 'message': str(e)}), 500
@@ -4,3 +4,10 @@ db = SQLAlchemy()
 
 from .user import User
 from .note import Note
+from .rate_limit import RateLimitBucket
+from .account_deletion import AccountDeletion
+from .note_stats import UserNoteStats
+from .identity_cache import IdentityCacheEntry
+from .idempotency import IdempotencyKey
+from .note_revision import NoteRevision
+from .token_revocation import TokenRevocation
@@ -0,0 +1,16 @@
+import uuid
+from datetime import datetime
+from . import db
+
+class AccountDeletion(db.Model):
+    __tablename__ = 'account_deletions'
+
+    deletion_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    # No foreign key: the user row is removed once the purge finishes.
+    user_id = db.Column(db.String(36), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    notes_total = db.Column(db.Integer, nullable=True)
+    notes_deleted = db.Column(db.Integer, nullable=False, default=0)
+    created_on = db.Column(db.DateTime, default=datetime.utcnow)
+    started_on = db.Column(db.DateTime, nullable=True)
+    finished_on = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,15 @@
+from . import db
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    __bind_key__ = 'shared'
+
+    # sha256 of scope, method, path and the client's Idempotency-Key header.
+    key_hash = db.Column(db.String(64), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='in_progress')
+    response_status = db.Column(db.Integer, nullable=True)
+    response_mimetype = db.Column(db.String(100), nullable=True)
+    response_body = db.Column(db.LargeBinary, nullable=True)
+    created_at = db.Column(db.Float, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
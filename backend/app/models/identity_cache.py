@@ -0,0 +1,11 @@
+from . import db
+
+class IdentityCacheEntry(db.Model):
+    __tablename__ = 'identity_cache'
+    __bind_key__ = 'shared'
+
+    cache_key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
+    # Bumped by reads (coarsely), so the bound evicts least recently used entries.
+    last_used = db.Column(db.Float, nullable=False, index=True)
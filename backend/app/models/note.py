@@ -10,4 +10,4 @@ class Note(db.Model):
     note_content = db.Column(db.Text, nullable=True)
     last_update = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_on = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=False)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False, index=True)
@@ -0,0 +1,16 @@
+from datetime import datetime
+from . import db
+
+class NoteRevision(db.Model):
+    __tablename__ = 'note_revisions'
+
+    note_id = db.Column(db.String(36), db.ForeignKey('notes.note_id', ondelete='CASCADE'), primary_key=True)
+    revision_no = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.String(36), nullable=False, index=True)
+    note_title = db.Column(db.String(200), nullable=False)
+    # zlib-compressed: the full content for snapshots, otherwise a delta
+    # against the previous revision (see app.utils.revisions).
+    is_snapshot = db.Column(db.Boolean, nullable=False, default=False)
+    payload = db.Column(db.LargeBinary(16 * 1024 * 1024), nullable=False)
+    content_size = db.Column(db.Integer, nullable=False, default=0)
+    created_on = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,9 @@
+from . import db
+
+class UserNoteStats(db.Model):
+    __tablename__ = 'user_note_stats'
+
+    user_id = db.Column(db.String(36), db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    note_count = db.Column(db.Integer, nullable=False, default=0)
+    content_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    last_activity = db.Column(db.DateTime, nullable=True)
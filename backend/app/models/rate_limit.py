@@ -0,0 +1,9 @@
+from . import db
+
+class RateLimitBucket(db.Model):
+    __tablename__ = 'rate_limit_buckets'
+    __bind_key__ = 'shared'
+
+    bucket_key = db.Column(db.String(255), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False)
@@ -0,0 +1,11 @@
+from . import db
+
+class TokenRevocation(db.Model):
+    __tablename__ = 'token_revocations'
+    __bind_key__ = 'shared'
+
+    # 'jti:<token id>' for a logout, 'user:<user id>' for every token of a user.
+    revocation_key = db.Column(db.String(255), primary_key=True)
+    created_at = db.Column(db.Float, nullable=False, index=True)
+    # Once every token it could match has expired the row can go.
+    expires_at = db.Column(db.Float, nullable=False, index=True)
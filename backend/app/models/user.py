@@ -11,5 +11,8 @@ class User(db.Model):
     password = db.Column(db.String(255), nullable=False)
     last_update = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_on = db.Column(db.DateTime, default=datetime.utcnow)
+    deleted_at = db.Column(db.DateTime, nullable=True)
 
-    notes = db.relationship('Note', backref='user', lazy=True, cascade='all, delete-orphan')
+    # passive_deletes: never load a user's notes just to delete them; the purge
+    # job removes them in batches and the FK cascades anything left behind.
+    notes = db.relationship('Note', backref='user', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
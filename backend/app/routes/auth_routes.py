@@ -1,24 +1,50 @@
+import json
+
 from flask import Blueprint, request, jsonify, current_app, abort
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
-from app.models import User, db
+from app.models import AccountDeletion, User, db
 from app.schemas.user_schema import UserSignUpSchema, UserSignInSchema, UserUpdateSchema
-from app.utils.validators import validate_json
+from app.utils.validators import validate_body
+from app.utils.rate_limiter import limiter, credential_keys
+from app.utils.account_purge import schedule_account_deletion
+from app.utils.identity_cache import identity_cache
+from app.utils.idempotency import idempotent, anonymous_scope
+from app.utils.revocation import revocations
 from bcrypt import hashpw, gensalt, checkpw
 
 auth_bp = Blueprint('auth', __name__)
 
-@auth_bp.route('/signup', methods=['POST'])
-def signup():
-    data = request.get_json()
-    validated_data, errors = validate_json(UserSignUpSchema, data)
-    if errors:
-        return jsonify({'error': 'Validation failed', 'details': errors}), 400
+TOKEN_FIELDS = ('access_token', 'refresh_token')
+
+
+def _without_tokens(response):
+    # Idempotency rows outlive the request; never keep live credentials in them.
+    data = response.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None
+    return json.dumps({k: v for k, v in data.items() if k not in TOKEN_FIELDS}).encode('utf-8')
+
 
+def _replay_signup(row):
+    data = json.loads(row.response_body)
+    user_id = (data.get('user') or {}).get('user_id')
+    if user_id and User.query.filter_by(user_id=user_id, deleted_at=None).first():
+        # Same key and body, password included: as good as signing in again.
+        data['access_token'] = create_access_token(identity=user_id)
+        data['refresh_token'] = create_refresh_token(identity=user_id)
+    return jsonify(data), row.response_status
+
+
+@auth_bp.route('/signup', methods=['POST'])
+@validate_body(UserSignUpSchema)
+@limiter.limit('credentials', key_func=credential_keys)
+@idempotent(anonymous_scope, store=_without_tokens, replay=_replay_signup)
+def signup(validated_data):
     if User.query.filter_by(user_email=validated_data.user_email).first():
         return jsonify({'error': 'Email already registered'}), 409
 
     password_bytes = validated_data.password.encode('utf-8') 
-    hashed_password = hashpw(password_bytes, gensalt())   
+    hashed_password = hashpw(password_bytes, gensalt(current_app.config['BCRYPT_ROUNDS']))   
     hashed_password_str = hashed_password.decode('utf-8')
     new_user = User(
         user_name=validated_data.user_name,
@@ -48,13 +74,10 @@ def signup():
 
 
 @auth_bp.route('/signin', methods=['POST'])
-def signin():
-    data = request.get_json()
-    validated_data, errors = validate_json(UserSignInSchema, data)
-    if errors:
-        abort(400, description={'validation_errors': errors})
-
-    user = User.query.filter_by(user_email=validated_data.user_email).first()
+@validate_body(UserSignInSchema)
+@limiter.limit('credentials', key_func=credential_keys)
+def signin(validated_data):
+    user = User.query.filter_by(user_email=validated_data.user_email, deleted_at=None).first()
     if not user:
         abort(401, description='Invalid credentials')
 
@@ -78,31 +101,43 @@ def signin():
 
 @auth_bp.route('/refresh', methods=['POST'])
 @jwt_required(refresh=True)
+@limiter.limit()
 def refresh():
     current_user_id = get_jwt_identity()
+    # Deletion revokes the user's tokens on every worker (see revocations);
+    # the row check also covers a deletion whose revocation write failed
+    # after the deletion was committed.
+    if not User.query.filter_by(user_id=current_user_id, deleted_at=None).first():
+        abort(401, description='Account no longer exists')
     new_access_token = create_access_token(identity=current_user_id)
     return jsonify({'access_token': new_access_token}), 200
 
-@auth_bp.route('/api/auth/me', methods=['GET', 'PUT'])
+@auth_bp.route('/me', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
-def current_user():
+@limiter.limit()
+@validate_body(UserUpdateSchema)
+def current_user(validated_data):
     current_user_id = get_jwt_identity()
-    user = User.query.filter_by(user_id=current_user_id).first()
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
 
     if request.method == 'GET':
-        return jsonify({
-            'user_id': user.user_id,
-            'user_name': user.user_name,
-            'user_email': user.user_email
-        }), 200
+        profile = identity_cache.get(current_user_id)
+        if profile is None:
+            user = User.query.filter_by(user_id=current_user_id, deleted_at=None).first()
+            if not user:
+                return jsonify({'error': 'User not found'}), 404
+            profile = {
+                'user_id': user.user_id,
+                'user_name': user.user_name,
+                'user_email': user.user_email
+            }
+            identity_cache.set(current_user_id, profile)
+        return jsonify(profile), 200
+
+    user = User.query.filter_by(user_id=current_user_id, deleted_at=None).first()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
 
     if request.method == 'PUT':
-        data = request.get_json()
-        validated_data, errors = validate_json(UserUpdateSchema, data)
-        if errors:
-            abort(400, description={'validation_errors': errors})
         user_name = validated_data.user_name
         user_email = validated_data.user_email
 
@@ -121,17 +156,54 @@ def current_user():
             db.session.rollback()
             return jsonify({'error': 'Failed to update user'}), 500
 
+        identity_cache.invalidate(current_user_id)
+
         return jsonify({
             'message': 'User updated successfully',
             'user_id': user.user_id,
             'user_name': user.user_name,
             'user_email': user.user_email
         }), 200
+
+    if request.method == 'DELETE':
+        try:
+            deletion = schedule_account_deletion(user)
+        except Exception:
+            db.session.rollback()
+            return jsonify({'error': 'Failed to delete account'}), 500
+
+        identity_cache.invalidate(current_user_id)
+
+        return jsonify({
+            'message': 'Account deletion scheduled',
+            'deletion_id': deletion.deletion_id,
+            'status': deletion.status
+        }), 202
+
+
+@auth_bp.route('/deletions/<deletion_id>', methods=['GET'])
+@limiter.limit(key_func=credential_keys)
+def deletion_status(deletion_id):
+    # Unauthenticated on purpose: the account's tokens are already revoked.
+    # The deletion id is a random UUID only handed to the account owner.
+    deletion = db.session.get(AccountDeletion, deletion_id)
+    if not deletion:
+        abort(404, description='Deletion not found')
+
+    return jsonify({
+        'deletion_id': deletion.deletion_id,
+        'status': deletion.status,
+        'notes_total': deletion.notes_total,
+        'notes_deleted': deletion.notes_deleted,
+        'created_on': deletion.created_on.isoformat(),
+        'finished_on': deletion.finished_on.isoformat() if deletion.finished_on else None
+    }), 200
     
 
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
+@limiter.limit()
 def logout():
-    jti = get_jwt()['jti']
-    current_app.blacklisted_tokens.add(jti)
+    claims = get_jwt()
+    revocations.revoke_token(claims['jti'], claims['exp'])
     return jsonify({'message': 'Successfully logged out'}), 200
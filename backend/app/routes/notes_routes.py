@@ -1,16 +1,23 @@
-from flask import Blueprint, request, jsonify, abort
+from flask import Blueprint, jsonify, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import Note, db
+from app.models import Note, NoteRevision
 from app.schemas.note_schema import NoteCreateSchema, NoteUpdateSchema
-from app.utils.validators import validate_json
+from app.utils.validators import validate_body
+from app.utils.note_stats import content_size, get_note_stats, record_note_change
+from app.utils.rate_limiter import limiter
+from app.utils.sharding import notes_session
+from app.utils.idempotency import idempotent
+from app.utils.revisions import delete_revisions, reconstruct, record_revision
 
 notes_bp = Blueprint('notes', __name__)
 
 @notes_bp.route('', methods=['GET'])
 @jwt_required()
+@limiter.limit()
 def get_notes():
     current_user_id = get_jwt_identity()
-    notes = Note.query.filter_by(user_id=current_user_id).order_by(Note.last_update.desc()).all()
+    session = notes_session(current_user_id)
+    notes = session.query(Note).filter_by(user_id=current_user_id).order_by(Note.last_update.desc()).all()
 
     return jsonify({
         'notes': [{
@@ -25,12 +32,12 @@ def get_notes():
 
 @notes_bp.route('', methods=['POST'])
 @jwt_required()
-def create_note():
+@limiter.limit()
+@validate_body(NoteCreateSchema)
+@idempotent()
+def create_note(validated_data):
     current_user_id = get_jwt_identity()
-    data = request.get_json()
-    validated_data, errors = validate_json(NoteCreateSchema, data)
-    if errors:
-        abort(400, description={'validation_errors': errors})
+    session = notes_session(current_user_id)
 
     new_note = Note(
         note_title=validated_data.note_title,
@@ -39,10 +46,13 @@ def create_note():
     )
 
     try:
-        db.session.add(new_note)
-        db.session.commit()
+        session.add(new_note)
+        session.flush()
+        record_revision(session, new_note)
+        record_note_change(session, current_user_id, 1, content_size(new_note.note_content))
+        session.commit()
     except Exception:
-        db.session.rollback()
+        session.rollback()
         abort(500, description='Failed to create note')
 
     return jsonify({
@@ -57,11 +67,30 @@ def create_note():
     }), 201
 
 
+@notes_bp.route('/stats', methods=['GET'])
+@jwt_required()
+@limiter.limit()
+def get_stats():
+    current_user_id = get_jwt_identity()
+    session = notes_session(current_user_id)
+    note_count, content_bytes, last_activity = get_note_stats(session, current_user_id)
+
+    return jsonify({
+        'stats': {
+            'note_count': note_count,
+            'content_bytes': content_bytes,
+            'last_activity': last_activity.isoformat() if last_activity else None
+        }
+    }), 200
+
+
 @notes_bp.route('/<note_id>', methods=['GET'])
 @jwt_required()
+@limiter.limit()
 def get_note(note_id):
     current_user_id = get_jwt_identity()
-    note = Note.query.filter_by(note_id=note_id, user_id=current_user_id).first()
+    session = notes_session(current_user_id)
+    note = session.query(Note).filter_by(note_id=note_id, user_id=current_user_id).first()
     if not note:
         abort(404, description='Note not found')
 
@@ -78,26 +107,32 @@ def get_note(note_id):
 
 @notes_bp.route('/<note_id>', methods=['PUT'])
 @jwt_required()
-def update_note(note_id):
+@limiter.limit()
+@validate_body(NoteUpdateSchema)
+def update_note(note_id, validated_data):
     current_user_id = get_jwt_identity()
-    data = request.get_json()
-    validated_data, errors = validate_json(NoteUpdateSchema, data)
-    if errors:
-        abort(400, description={'validation_errors': errors})
+    session = notes_session(current_user_id)
 
-    note = Note.query.filter_by(note_id=note_id, user_id=current_user_id).first()
+    # Lock the row: the revision number and the delta's base content must be the
+    # latest committed state, not what a concurrent edit is about to replace.
+    note = session.query(Note).filter_by(note_id=note_id, user_id=current_user_id).with_for_update().first()
     if not note:
         abort(404, description='Note not found')
 
+    old_title, old_content = note.note_title, note.note_content
+    old_size = content_size(old_content)
     if validated_data.note_title is not None:
         note.note_title = validated_data.note_title
     if validated_data.note_content is not None:
         note.note_content = validated_data.note_content
 
     try:
-        db.session.commit()
+        if (note.note_title, note.note_content) != (old_title, old_content):
+            record_revision(session, note, old_title, old_content)
+        record_note_change(session, current_user_id, 0, content_size(note.note_content) - old_size)
+        session.commit()
     except Exception:
-        db.session.rollback()
+        session.rollback()
         abort(500, description='Failed to update note')
 
     return jsonify({
@@ -114,17 +149,110 @@ def update_note(note_id):
 
 @notes_bp.route('/<note_id>', methods=['DELETE'])
 @jwt_required()
+@limiter.limit()
 def delete_note(note_id):
     current_user_id = get_jwt_identity()
-    note = Note.query.filter_by(note_id=note_id, user_id=current_user_id).first()
+    session = notes_session(current_user_id)
+    note = session.query(Note).filter_by(note_id=note_id, user_id=current_user_id).with_for_update().first()
     if not note:
         abort(404, description='Note not found')
 
     try:
-        db.session.delete(note)
-        db.session.commit()
+        delete_revisions(session, note.note_id)
+        session.delete(note)
+        record_note_change(session, current_user_id, -1, -content_size(note.note_content))
+        session.commit()
     except Exception:
-        db.session.rollback()
+        session.rollback()
         abort(500, description='Failed to delete note')
 
     return jsonify({'message': 'Note deleted successfully'}), 200
+
+
+@notes_bp.route('/<note_id>/revisions', methods=['GET'])
+@jwt_required()
+@limiter.limit()
+def get_revisions(note_id):
+    current_user_id = get_jwt_identity()
+    session = notes_session(current_user_id)
+    note = session.query(Note).filter_by(note_id=note_id, user_id=current_user_id).first()
+    if not note:
+        abort(404, description='Note not found')
+
+    # Metadata only: listing never has to decode a payload.
+    revisions = session.query(
+        NoteRevision.revision_no, NoteRevision.note_title, NoteRevision.content_size, NoteRevision.created_on
+    ).filter_by(note_id=note_id).order_by(NoteRevision.revision_no.desc()).all()
+
+    return jsonify({
+        'revisions': [{
+            'revision_no': revision.revision_no,
+            'note_title': revision.note_title,
+            'content_size': revision.content_size,
+            'created_on': revision.created_on.isoformat()
+        } for revision in revisions]
+    }), 200
+
+
+@notes_bp.route('/<note_id>/revisions/<int:revision_no>', methods=['GET'])
+@jwt_required()
+@limiter.limit()
+def get_revision(note_id, revision_no):
+    current_user_id = get_jwt_identity()
+    session = notes_session(current_user_id)
+    revision = session.query(NoteRevision).filter_by(
+        note_id=note_id, revision_no=revision_no, user_id=current_user_id
+    ).first()
+    if not revision:
+        abort(404, description='Revision not found')
+
+    _, content = reconstruct(session, note_id, revision_no)
+
+    return jsonify({
+        'revision': {
+            'revision_no': revision.revision_no,
+            'note_title': revision.note_title,
+            'note_content': content,
+            'content_size': revision.content_size,
+            'created_on': revision.created_on.isoformat()
+        }
+    }), 200
+
+
+@notes_bp.route('/<note_id>/revisions/<int:revision_no>/restore', methods=['POST'])
+@jwt_required()
+@limiter.limit()
+def restore_revision(note_id, revision_no):
+    current_user_id = get_jwt_identity()
+    session = notes_session(current_user_id)
+
+    note = session.query(Note).filter_by(note_id=note_id, user_id=current_user_id).with_for_update().first()
+    if not note:
+        abort(404, description='Note not found')
+    restored = reconstruct(session, note_id, revision_no)
+    if restored is None:
+        abort(404, description='Revision not found')
+
+    old_title, old_content = note.note_title, note.note_content
+    old_size = content_size(old_content)
+    note.note_title, note.note_content = restored
+
+    try:
+        if (note.note_title, note.note_content) != (old_title, old_content):
+            record_revision(session, note, old_title, old_content)
+        record_note_change(session, current_user_id, 0, content_size(note.note_content) - old_size)
+        session.commit()
+    except Exception:
+        session.rollback()
+        abort(500, description='Failed to restore note')
+
+    return jsonify({
+        'message': 'Note restored successfully',
+        'note': {
+            'note_id': note.note_id,
+            'note_title': note.note_title,
+            'note_content': note.note_content,
+            'last_update': note.last_update.isoformat(),
+            'created_on': note.created_on.isoformat()
+        }
+    }), 200
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, root_validator,constr
+from pydantic import BaseModel, EmailStr, model_validator, constr
 
 class UserSignUpSchema(BaseModel):
     user_name: str
@@ -6,18 +6,15 @@ class UserSignUpSchema(BaseModel):
     password: str
     confirm_password: str
 
-    @root_validator
-    def validate_passwords(cls, values):
-        password = values.get("password")
-        confirm_password = values.get("confirm_password")
-
-        if password != confirm_password:
+    @model_validator(mode='after')
+    def validate_passwords(self):
+        if self.password != self.confirm_password:
             raise ValueError("Passwords do not match")
 
-        if len(password) < 6:
+        if len(self.password) < 6:
             raise ValueError("Password must be at least 6 characters long")
 
-        return values
+        return self
 
     class Config:
         str_strip_whitespace = True
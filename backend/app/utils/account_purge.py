@@ -0,0 +1,132 @@
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import delete, func, select, tuple_
+
+from app.models import AccountDeletion, Note, NoteRevision, User, UserNoteStats, db
+from app.utils.logger import logger
+from app.utils.revocation import revocations
+from app.utils.sharding import notes_session
+
+UNFINISHED_STATUSES = ('pending', 'running', 'failed')
+
+
+def schedule_account_deletion(user):
+    """Mark ``user`` deleted, revoke their tokens and queue the note purge."""
+    user.deleted_at = datetime.utcnow()
+    deletion = AccountDeletion(user_id=user.user_id)
+    db.session.add(deletion)
+    db.session.commit()
+
+    revocations.revoke_user(user.user_id)
+
+    if current_app.config['ACCOUNT_PURGE_IN_BACKGROUND']:
+        start_purge_thread(current_app._get_current_object(), deletion.deletion_id)
+
+    return deletion
+
+
+def start_purge_thread(app, deletion_id):
+    def run():
+        with app.app_context():
+            try:
+                purge_account(deletion_id)
+            except Exception:
+                pass  # already logged and recorded as 'failed'; the CLI resumes it
+            finally:
+                db.session.remove()
+
+    thread = threading.Thread(target=run, name=f'account-purge-{deletion_id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def _delete_batch(session, model, user_id, limit):
+    table = model.__table__
+    if session.get_bind(mapper=model).dialect.name == 'mysql':
+        stmt = (
+            delete(table)
+            .where(table.c.user_id == user_id)
+            .with_dialect_options(mysql_limit=limit)
+        )
+    else:
+        # Portable spelling of DELETE ... LIMIT for backends without it.
+        pk = list(table.primary_key.columns)
+        batch = select(*pk).where(table.c.user_id == user_id).limit(limit)
+        if len(pk) == 1:
+            stmt = delete(table).where(pk[0].in_(batch.scalar_subquery()))
+        else:
+            stmt = delete(table).where(tuple_(*pk).in_(batch))
+    return session.execute(stmt).rowcount
+
+
+def purge_account(deletion_id):
+    """Delete the user's note revisions and notes in batches, then the user row itself.
+
+    Safe to re-run: a failed or interrupted purge resumes where it stopped.
+    """
+    config = current_app.config
+    deletion = db.session.get(AccountDeletion, deletion_id)
+    if deletion is None or deletion.status == 'completed':
+        return deletion
+
+    user_id = deletion.user_id
+    session = notes_session(user_id)
+    deletion.status = 'running'
+    deletion.started_on = deletion.started_on or datetime.utcnow()
+    if deletion.notes_total is None:
+        deletion.notes_total = session.scalar(
+            select(func.count()).select_from(Note).where(Note.user_id == user_id)
+        )
+    db.session.commit()
+
+    batch_size = config['ACCOUNT_PURGE_BATCH_SIZE']
+    try:
+        # Revisions are not counted in notes_deleted; they go first so no
+        # revision is ever left without its note.
+        while _delete_batch(session, NoteRevision, user_id, batch_size) == batch_size:
+            session.commit()
+            time.sleep(config['ACCOUNT_PURGE_PAUSE'])
+        session.commit()
+
+        while True:
+            deleted = _delete_batch(session, Note, user_id, batch_size)
+            session.commit()
+            deletion.notes_deleted += deleted
+            db.session.commit()
+            if deleted < batch_size:
+                break
+            time.sleep(config['ACCOUNT_PURGE_PAUSE'])
+
+        session.execute(delete(UserNoteStats).where(UserNoteStats.user_id == user_id))
+        session.commit()
+        db.session.execute(delete(User).where(User.user_id == user_id))
+        deletion.status = 'completed'
+        deletion.finished_on = datetime.utcnow()
+        db.session.commit()
+    except Exception:
+        session.rollback()
+        db.session.rollback()
+        logger.exception("Account purge %s failed", deletion_id)
+        deletion.status = 'failed'
+        db.session.commit()
+        raise
+
+    return deletion
+
+
+def resume_unfinished_purges():
+    deletion_ids = db.session.scalars(
+        select(AccountDeletion.deletion_id)
+        .where(AccountDeletion.status.in_(UNFINISHED_STATUSES))
+        .order_by(AccountDeletion.created_on)
+    ).all()
+    failed = 0
+    for deletion_id in deletion_ids:
+        try:
+            purge_account(deletion_id)
+        except Exception:
+            failed += 1
+    return len(deletion_ids), failed
@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import current_app, request
+
+# wbits=31 makes zlib write a gzip header and trailer.
+GZIP_WBITS = 31
+
+
+class CompressedBodyCache:
+    """LRU of gzipped bodies keyed by (ETag, level), bounded by total bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(response):
+    config = current_app.config
+    if (
+        not config['COMPRESS_ENABLED']
+        or response.mimetype not in config['COMPRESS_MIMETYPES']
+        or not 200 <= response.status_code < 300
+        or response.status_code in (204, 206)
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    accepts_gzip = request.accept_encodings['gzip'] > 0
+    level = config['COMPRESS_LEVEL']
+
+    if response.is_streamed:
+        # Size is unknown up front, so stream everything through the compressor.
+        if accepts_gzip:
+            response.response = _gzip_stream(response.iter_encoded(), level)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers.pop('Content-Length', None)
+        return response
+
+    data = response.get_data()
+    compress = accepts_gzip and len(data) >= config['COMPRESS_MIN_SIZE']
+
+    etag = None
+    if config['RESPONSE_ETAGS'] and request.method in ('GET', 'HEAD') and response.status_code == 200:
+        etag = response.get_etag()[0] or hashlib.sha1(data).hexdigest()
+        # The gzipped body is a different representation and needs its own tag.
+        response.set_etag(f'{etag}-gzip' if compress else etag)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+    if compress:
+        cache = current_app.extensions['compression']
+        body = cache.get((etag, level)) if etag else None
+        if body is None:
+            body = gzip.compress(data, compresslevel=level, mtime=0)
+            if etag:
+                cache.put((etag, level), body)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = 'gzip'
+
+    return response
+
+
+def init_compression(app):
+    app.extensions['compression'] = CompressedBodyCache(app.config['COMPRESS_CACHE_MAX_BYTES'])
+    app.after_request(compress_response)
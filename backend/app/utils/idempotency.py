@@ -0,0 +1,209 @@
+import hashlib
+import hmac
+import threading
+import time
+from functools import wraps
+
+from flask import Response, current_app, g, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models import IdempotencyKey, db
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Expired keys are swept every this many claims instead of on every one.
+SWEEP_EVERY = 1000
+
+# Wakes duplicates waiting in this process as soon as the first request finishes;
+# duplicates on other workers fall back to polling.
+_events = {}
+_events_lock = threading.Lock()
+_claims = 0
+
+
+def identity_scope():
+    return f"user:{get_jwt_identity()}"
+
+
+def anonymous_scope():
+    return 'anonymous'
+
+
+def make_key_hash(scope, method, path, key):
+    return hashlib.sha256(f"{scope}\n{method}\n{path}\n{key}".encode('utf-8')).hexdigest()
+
+
+def make_fingerprint(raw_body):
+    # Keyed, so a leaked row cannot be used to guess a body (e.g. a signup
+    # password) offline.
+    secret = current_app.config['JWT_SECRET_KEY'].encode('utf-8')
+    return hmac.new(secret, raw_body, hashlib.sha256).hexdigest()
+
+
+def _engine():
+    return db.engines[IdempotencyKey.__bind_key__]
+
+
+def _notify(key_hash):
+    with _events_lock:
+        event = _events.pop(key_hash, None)
+    if event is not None:
+        event.set()
+
+
+def _load(key_hash):
+    table = IdempotencyKey.__table__
+    with _engine().connect() as conn:
+        return conn.execute(select(table).where(table.c.key_hash == key_hash)).first()
+
+
+def claim(key_hash, fingerprint):
+    """Insert an in-progress row for ``key_hash``.
+
+    Returns ``None`` when this request now owns the key, otherwise the live row
+    that another request created.
+    """
+    global _claims
+    config = current_app.config
+    table = IdempotencyKey.__table__
+
+    for _ in range(3):
+        now = time.time()
+        try:
+            with _engine().begin() as conn:
+                conn.execute(insert(table).values(
+                    key_hash=key_hash,
+                    fingerprint=fingerprint,
+                    status='in_progress',
+                    created_at=now,
+                    expires_at=now + config['IDEMPOTENCY_LOCK_TIMEOUT']
+                ))
+                _claims += 1
+                if _claims % SWEEP_EVERY == 0:
+                    conn.execute(delete(table).where(table.c.expires_at <= now))
+        except IntegrityError:
+            row = _load(key_hash)
+            if row is not None and row.expires_at > now:
+                return row
+            # Expired response or abandoned claim: clear it and try again.
+            with _engine().begin() as conn:
+                conn.execute(delete(table).where(table.c.key_hash == key_hash, table.c.expires_at <= now))
+            continue
+
+        with _events_lock:
+            _events[key_hash] = threading.Event()
+        return None
+
+    raise RuntimeError(f'Could not claim idempotency key {key_hash}')
+
+
+def complete(key_hash, response, body=None):
+    """Store ``response`` for replay; ``body`` overrides what is kept of its data."""
+    table = IdempotencyKey.__table__
+    with _engine().begin() as conn:
+        conn.execute(
+            update(table)
+            .where(table.c.key_hash == key_hash)
+            .values(
+                status='completed',
+                response_status=response.status_code,
+                response_mimetype=response.mimetype,
+                response_body=response.get_data() if body is None else body,
+                expires_at=time.time() + current_app.config['IDEMPOTENCY_TTL']
+            )
+        )
+    _notify(key_hash)
+
+
+def release(key_hash):
+    """Forget an in-progress claim so a retry runs the request again."""
+    table = IdempotencyKey.__table__
+    with _engine().begin() as conn:
+        conn.execute(delete(table).where(table.c.key_hash == key_hash, table.c.status == 'in_progress'))
+    _notify(key_hash)
+
+
+def wait_for(key_hash):
+    """Wait until the owning request finishes; returns its row or ``None`` if it gave up."""
+    config = current_app.config
+    deadline = time.monotonic() + config['IDEMPOTENCY_WAIT_TIMEOUT']
+    interval = config['IDEMPOTENCY_POLL_INTERVAL']
+
+    while True:
+        row = _load(key_hash)
+        if row is None or row.status == 'completed':
+            return row
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return row
+        event = _events.get(key_hash)
+        if event is not None:
+            event.wait(min(interval, remaining))
+        else:
+            time.sleep(min(interval, remaining))
+
+
+def purge_expired():
+    table = IdempotencyKey.__table__
+    with _engine().begin() as conn:
+        return conn.execute(delete(table).where(table.c.expires_at <= time.time())).rowcount
+
+
+def stored_response(row):
+    return Response(row.response_body, status=row.response_status, mimetype=row.response_mimetype)
+
+
+def idempotent(scope=identity_scope, store=None, replay=stored_response):
+    """Replay the stored response for a repeated ``Idempotency-Key``.
+
+    Place inside ``@validate_body`` (the fingerprint is the raw body) and,
+    for ``identity_scope``, inside ``@jwt_required()``. 5xx responses and
+    exceptions are not stored, so a retry runs the request again.
+
+    ``store(response)`` returns the bytes to keep instead of the full body,
+    e.g. without credentials, and ``replay(row)`` rebuilds a response from
+    them.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return fn(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+            key_hash = make_key_hash(scope(), request.method, request.path, key)
+            fingerprint = make_fingerprint(g.get('raw_body', b''))
+
+            while True:
+                row = claim(key_hash, fingerprint)
+                if row is None:
+                    break
+                if row.fingerprint != fingerprint:
+                    return jsonify({'error': f'{HEADER} was already used with a different request'}), 422
+                if row.status != 'completed':
+                    row = wait_for(key_hash)
+                    if row is None:
+                        continue  # the first request failed; run it ourselves
+                    if row.status != 'completed':
+                        return jsonify({'error': f'A request with this {HEADER} is still in progress'}), 409
+                response = make_response(replay(row))
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            try:
+                response = make_response(fn(*args, **kwargs))
+            except Exception:
+                release(key_hash)
+                raise
+
+            if response.status_code >= 500:
+                release(key_hash)
+            else:
+                complete(key_hash, response, store(response) if store else None)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,206 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models import IdentityCacheEntry, db
+
+# Stored by delete() in place of a value: reads miss and fills are refused
+# until it expires. json.dumps never produces an empty string.
+TOMBSTONE = ''
+
+
+class MemoryBackend:
+    """Per-process LRU with a TTL. Other workers see updates once their entry expires."""
+
+    def __init__(self, ttl, max_entries, tombstone_ttl=10, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.tombstone_ttl = tombstone_ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            if value == TOMBSTONE:
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _put(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, key, value):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == TOMBSTONE and entry[1] > now:
+                return
+            self._put(key, value, now + self.ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._put(key, TOMBSTONE, self.clock() + self.tombstone_ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLBackend:
+    """Entries in the ``shared`` bind, so an invalidation is seen by every worker.
+
+    Holds at most ``max_entries`` (plus up to one sweep interval of writes),
+    evicting the least recently used. Only worth it when the ``shared`` bind is
+    a separate low-latency store, not the main database.
+    """
+
+    # Expired and excess rows are swept every this many writes instead of on every one.
+    SWEEP_EVERY = 1000
+
+    def __init__(self, ttl, max_entries, tombstone_ttl=10, bind_key='shared', clock=time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.tombstone_ttl = tombstone_ttl
+        self.bind_key = bind_key
+        self.clock = clock
+        # A read refreshes last_used only when it is older than this, so most
+        # hits stay a single SELECT.
+        self.touch_after = ttl / 10
+        self.sweep_every = max(1, min(self.SWEEP_EVERY, max_entries // 10))
+        self._writes = 0
+
+    @property
+    def _engine(self):
+        return db.engines[self.bind_key]
+
+    def get(self, key):
+        table = IdentityCacheEntry.__table__
+        now = self.clock()
+        with self._engine.connect() as conn:
+            row = conn.execute(
+                select(table.c.value, table.c.last_used)
+                .where(table.c.cache_key == key, table.c.expires_at > now)
+            ).first()
+            if row is None or row.value == TOMBSTONE:
+                return None
+            if row.last_used <= now - self.touch_after:
+                conn.execute(update(table).where(table.c.cache_key == key).values(last_used=now))
+                conn.commit()
+        return json.loads(row.value)
+
+    def set(self, key, value):
+        table = IdentityCacheEntry.__table__
+        now = self.clock()
+        values = {'value': json.dumps(value), 'expires_at': now + self.ttl, 'last_used': now}
+        with self._engine.begin() as conn:
+            updated = conn.execute(
+                update(table)
+                .where(table.c.cache_key == key)
+                .where(~((table.c.value == TOMBSTONE) & (table.c.expires_at > now)))
+                .values(**values)
+            )
+            if not updated.rowcount:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert(table).values(cache_key=key, **values))
+                except IntegrityError:
+                    pass  # cached concurrently by another worker, or invalidated
+
+            self._writes += 1
+            if self._writes % self.sweep_every == 0:
+                self._sweep(conn, now)
+
+    def _sweep(self, conn, now):
+        table = IdentityCacheEntry.__table__
+        conn.execute(delete(table).where(table.c.expires_at <= now))
+        excess = conn.scalar(select(func.count()).select_from(table)) - self.max_entries
+        if excess > 0:
+            # DELETE ... ORDER BY ... LIMIT is not portable; find the cutoff instead.
+            cutoff = conn.scalar(
+                select(table.c.last_used).order_by(table.c.last_used).offset(excess - 1).limit(1)
+            )
+            conn.execute(delete(table).where(table.c.last_used <= cutoff))
+
+    def delete(self, key):
+        table = IdentityCacheEntry.__table__
+        now = self.clock()
+        values = {'value': TOMBSTONE, 'expires_at': now + self.tombstone_ttl, 'last_used': now}
+        with self._engine.begin() as conn:
+            for _ in range(2):
+                if conn.execute(update(table).where(table.c.cache_key == key).values(**values)).rowcount:
+                    return
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert(table).values(cache_key=key, **values))
+                    return
+                except IntegrityError:
+                    pass  # filled concurrently; overwrite it on the next pass
+
+    def clear(self):
+        with self._engine.begin() as conn:
+            conn.execute(delete(IdentityCacheEntry.__table__))
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'sql': SQLBackend,
+}
+
+
+def _shared_url(app):
+    shared = (app.config.get('SQLALCHEMY_BINDS') or {}).get('shared')
+    return shared.get('url') if isinstance(shared, dict) else shared
+
+
+class IdentityCache:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend_name = app.config.get('IDENTITY_CACHE_BACKEND', 'memory')
+        if backend_name not in BACKENDS:
+            raise ValueError(f"Unknown IDENTITY_CACHE_BACKEND '{backend_name}'")
+        if backend_name == 'sql' and _shared_url(app) == app.config['SQLALCHEMY_DATABASE_URI']:
+            # A cache hit would cost the same round trip as the query it saves.
+            raise ValueError(
+                "IDENTITY_CACHE_BACKEND 'sql' needs SHARED_STATE_DATABASE_URL to point at a "
+                "separate low-latency store, not the main database"
+            )
+        app.extensions['identity_cache'] = BACKENDS[backend_name](
+            ttl=app.config['IDENTITY_CACHE_TTL'],
+            max_entries=app.config['IDENTITY_CACHE_MAX_ENTRIES'],
+            tombstone_ttl=app.config['IDENTITY_CACHE_TOMBSTONE_TTL']
+        )
+
+    @property
+    def backend(self):
+        return current_app.extensions['identity_cache']
+
+    def get(self, user_id):
+        return self.backend.get(f"user:{user_id}")
+
+    def set(self, user_id, profile):
+        self.backend.set(f"user:{user_id}", profile)
+
+    def invalidate(self, user_id):
+        self.backend.delete(f"user:{user_id}")
+
+
+identity_cache = IdentityCache()
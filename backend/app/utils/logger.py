@@ -2,12 +2,22 @@ import logging
 import os
 from flask import request
 
-os.makedirs("logs", exist_ok=True)
+
+class LazyFileHandler(logging.FileHandler):
+    """Creates the log directory and opens the file on the first record, not at import."""
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
 
 logger = logging.getLogger("inspektlabs")
 logger.setLevel(logging.INFO)
 
-handler = logging.FileHandler("logs/app.log")
+handler = LazyFileHandler(os.getenv("LOG_FILE", "logs/app.log"))
 handler.setLevel(logging.INFO)
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 handler.setFormatter(formatter)
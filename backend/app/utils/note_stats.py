@@ -0,0 +1,148 @@
+from datetime import datetime
+
+from sqlalchemy import cast, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models import Note, User, UserNoteStats, db
+from app.utils.sharding import notes_session
+
+
+def content_size(content):
+    return len(content.encode('utf-8')) if content else 0
+
+
+def _aggregate(session, user_ids):
+    """Recompute stats for ``user_ids`` from the notes table, keyed by user_id."""
+    rows = session.execute(
+        select(
+            Note.user_id,
+            func.count(),
+            func.coalesce(func.sum(func.length(cast(Note.note_content, db.LargeBinary))), 0),
+            func.max(Note.last_update)
+        )
+        .where(Note.user_id.in_(user_ids))
+        .group_by(Note.user_id)
+    )
+    return {user_id: (count, size, last) for user_id, count, size, last in rows}
+
+
+def record_note_change(session, user_id, count_delta=0, bytes_delta=0):
+    """Apply a note write to the user's stats row inside the caller's transaction.
+
+    Call after the note change is added to ``session`` and before the commit,
+    so the stats move in the same commit as the note.
+    """
+    table = UserNoteStats.__table__
+    now = datetime.utcnow()
+    session.flush()
+
+    result = session.execute(
+        update(table)
+        .where(table.c.user_id == user_id)
+        .values(
+            note_count=table.c.note_count + count_delta,
+            content_bytes=table.c.content_bytes + bytes_delta,
+            last_activity=now
+        )
+    )
+    if result.rowcount:
+        return
+
+    # First write since the feature shipped (or reconciliation): seed the row
+    # from the notes table, which already includes this change.
+    count, size, _ = _aggregate(session, [user_id]).get(user_id, (0, 0, None))
+    try:
+        with session.begin_nested():
+            session.execute(insert(table).values(
+                user_id=user_id, note_count=count, content_bytes=size, last_activity=now
+            ))
+    except IntegrityError:
+        # A concurrent request seeded it first; apply our delta on top.
+        record_note_change(session, user_id, count_delta, bytes_delta)
+
+
+def get_note_stats(session, user_id):
+    stats = session.get(UserNoteStats, user_id)
+    if stats is not None:
+        return stats.note_count, stats.content_bytes, stats.last_activity
+
+    # No row yet: the user has not written since stats were introduced. Seed
+    # it so only the first read pays for the aggregate.
+    count, size, last = _aggregate(session, [user_id]).get(user_id, (0, 0, None))
+    try:
+        with session.begin_nested():
+            session.execute(insert(UserNoteStats.__table__).values(
+                user_id=user_id, note_count=count, content_bytes=size, last_activity=last
+            ))
+        session.commit()
+    except IntegrityError:
+        # A concurrent note write seeded it first; its row is authoritative.
+        session.rollback()
+        return get_note_stats(session, user_id)
+    return count, size, last
+
+
+def reconcile_user_stats(session, user_ids, include_empty=False):
+    """Recompute the stats rows of ``user_ids``; ``include_empty`` also creates rows for users without notes.
+
+    ``session`` must not be in a transaction yet: the locking read has to be
+    its first statement.
+    """
+    table = UserNoteStats.__table__
+    # Lock existing rows first so concurrent writers apply their deltas
+    # after our recomputed values rather than being overwritten by them.
+    existing = set(session.scalars(
+        select(table.c.user_id).where(table.c.user_id.in_(user_ids)).with_for_update()
+    ))
+    computed = _aggregate(session, user_ids)
+
+    for user_id in user_ids:
+        count, size, last = computed.get(user_id, (0, 0, None))
+        if user_id in existing:
+            session.execute(
+                update(table)
+                .where(table.c.user_id == user_id)
+                .values(note_count=count, content_bytes=size)
+            )
+        elif count or include_empty:
+            try:
+                with session.begin_nested():
+                    session.execute(insert(table).values(
+                        user_id=user_id, note_count=count, content_bytes=size, last_activity=last
+                    ))
+            except IntegrityError:
+                pass  # a note write seeded it from the same source of truth
+    session.commit()
+
+
+def reconcile_note_stats(batch_size=500, user_ids=None):
+    """Rebuild user_note_stats from the notes table, ``batch_size`` users per transaction."""
+    processed = 0
+    last_user_id = ''
+    while True:
+        if user_ids is not None:
+            batch, user_ids = user_ids[:batch_size], user_ids[batch_size:]
+        else:
+            batch = db.session.scalars(
+                select(User.user_id)
+                .where(User.user_id > last_user_id)
+                .order_by(User.user_id)
+                .limit(batch_size)
+            ).all()
+            # End the read transaction, so the locking read in
+            # reconcile_user_stats starts a fresh snapshot instead of
+            # aggregating from one taken before concurrent note writes.
+            db.session.commit()
+        if not batch:
+            break
+
+        by_session = {}
+        for user_id in batch:
+            by_session.setdefault(notes_session(user_id), []).append(user_id)
+        for session, session_user_ids in by_session.items():
+            reconcile_user_stats(session, session_user_ids)
+
+        processed += len(batch)
+        last_user_id = batch[-1]
+
+    return processed
@@ -0,0 +1,165 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import TooManyRequests
+
+from app.models import RateLimitBucket, db
+
+
+class MemoryBackend:
+    """Token buckets kept in this process. Fast, but each worker counts separately.
+
+    At most ``max_keys`` buckets are kept; the least recently used one is
+    dropped first, which only ever lets that key start again with a full bucket.
+    """
+
+    def __init__(self, max_keys=100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate):
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLBackend:
+    """Token buckets stored in the ``shared`` bind so limits hold across workers."""
+
+    def __init__(self, bind_key='shared', clock=time.time):
+        self.bind_key = bind_key
+        self.clock = clock
+
+    def consume(self, key, capacity, rate):
+        table = RateLimitBucket.__table__
+        engine = db.engines[self.bind_key]
+
+        for _ in range(2):
+            now = self.clock()
+            try:
+                with engine.begin() as conn:
+                    row = conn.execute(
+                        select(table.c.tokens, table.c.updated_at)
+                        .where(table.c.bucket_key == key)
+                        .with_for_update()
+                    ).first()
+
+                    if row is None:
+                        tokens = capacity
+                    else:
+                        tokens = min(capacity, row.tokens + (now - row.updated_at) * rate)
+
+                    allowed = tokens >= 1
+                    if allowed:
+                        tokens -= 1
+
+                    if row is None:
+                        conn.execute(insert(table).values(bucket_key=key, tokens=tokens, updated_at=now))
+                    else:
+                        conn.execute(
+                            update(table)
+                            .where(table.c.bucket_key == key)
+                            .values(tokens=tokens, updated_at=now)
+                        )
+            except IntegrityError:
+                # Another worker created the bucket first; retry against its row.
+                continue
+
+            return allowed, 0 if allowed else (1 - tokens) / rate
+
+        return True, 0
+
+    def reset(self):
+        with db.engines[self.bind_key].begin() as conn:
+            conn.execute(RateLimitBucket.__table__.delete())
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'sql': SQLBackend,
+}
+
+
+def identity_keys():
+    return [f"user:{get_jwt_identity()}"]
+
+
+def credential_keys():
+    """Key by client IP and submitted email. Place inside ``@validate_body``."""
+    keys = [f"ip:{request.remote_addr}"]
+    email = getattr(g.get('validated_body'), 'user_email', None)
+    if email:
+        keys.append(f"email:{email.lower()}")
+    return keys
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend_name = app.config.get('RATELIMIT_BACKEND', 'memory')
+        if backend_name not in BACKENDS:
+            raise ValueError(f"Unknown RATELIMIT_BACKEND '{backend_name}'")
+        app.extensions['rate_limiter'] = BACKENDS[backend_name]()
+
+    @property
+    def backend(self):
+        return current_app.extensions['rate_limiter']
+
+    def check(self, scope, keys):
+        config = current_app.config
+        if not config.get('RATELIMIT_ENABLED', True):
+            return
+
+        capacity, period = config['RATELIMIT_LIMITS'][scope]
+        rate = capacity / period
+        for key in keys:
+            allowed, retry_after = self.backend.consume(f"{scope}:{key}", capacity, rate)
+            if not allowed:
+                raise TooManyRequests(
+                    description='Rate limit exceeded',
+                    retry_after=max(1, math.ceil(retry_after))
+                )
+
+    def limit(self, scope=None, key_func=identity_keys):
+        """Rate limit a view. Place below ``@jwt_required()`` when keying by identity."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                self.check(scope or request.blueprint, key_func())
+                return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+limiter = RateLimiter()
@@ -0,0 +1,188 @@
+import hashlib
+
+from sqlalchemy import create_engine, delete, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models import db
+from app.utils.note_stats import reconcile_user_stats
+from app.utils.sharding import SHARDED_TABLES, shards
+from app.utils.logger import logger
+
+STATS_TABLE = 'user_note_stats'
+
+
+def _pk_in(pk, keys):
+    if len(pk) == 1:
+        return pk[0].in_([key[0] for key in keys])
+    return tuple_(*pk).in_(keys)
+
+
+def _batches(session, table, user_id, batch_size):
+    pk = list(table.primary_key.columns)
+    last = None
+    while True:
+        query = select(table).where(table.c.user_id == user_id).order_by(*pk).limit(batch_size)
+        if last is not None:
+            query = query.where(tuple_(*pk) > tuple_(*last))
+        rows = session.execute(query).mappings().all()
+        if not rows:
+            break
+        yield pk, rows
+        last = [rows[-1][c.name] for c in pk]
+
+
+def _copy_rows(user_id, source, target, batch_size):
+    """Copy ``user_id``'s rows of every sharded table but the stats to ``target``, skipping rows it has."""
+    moved = 0
+    for name in SHARDED_TABLES:
+        if name == STATS_TABLE:
+            continue
+        table = db.metadata.tables[name]
+        for pk, rows in _batches(source, table, user_id, batch_size):
+            keys = [tuple(row[c.name] for c in pk) for row in rows]
+            existing = {tuple(row) for row in target.execute(select(*pk).where(_pk_in(pk, keys)))}
+            new_rows = [dict(row) for row, key in zip(rows, keys) if key not in existing]
+            if new_rows:
+                target.execute(insert(table), new_rows)
+            target.commit()
+            moved += len(new_rows)
+        source.commit()
+    return moved
+
+
+def _digests(session, table, user_id, batch_size):
+    digests = {}
+    for pk, rows in _batches(session, table, user_id, batch_size):
+        for row in rows:
+            key = tuple(row[c.name] for c in pk)
+            digests[key] = hashlib.md5(repr(tuple(row.values())).encode('utf-8')).digest()
+    return digests
+
+
+def _sync_rows(user_id, source, target, batch_size):
+    """Make ``user_id``'s rows on ``target`` match ``source``, rewriting only rows that differ."""
+    written = 0
+    for name in SHARDED_TABLES:
+        if name == STATS_TABLE:
+            continue
+        table = db.metadata.tables[name]
+        pk = list(table.primary_key.columns)
+        wanted = _digests(source, table, user_id, batch_size)
+        present = _digests(target, table, user_id, batch_size)
+
+        stale = [key for key in present if key not in wanted]
+        changed = [key for key, digest in wanted.items() if present.get(key) != digest]
+        for i in range(0, len(stale), batch_size):
+            target.execute(delete(table).where(_pk_in(pk, stale[i:i + batch_size])))
+        for i in range(0, len(changed), batch_size):
+            keys = changed[i:i + batch_size]
+            rows = source.execute(select(table).where(_pk_in(pk, keys))).mappings().all()
+            target.execute(delete(table).where(_pk_in(pk, keys)))
+            target.execute(insert(table), [dict(row) for row in rows])
+        target.commit()
+        written += len(changed)
+    return written
+
+
+def _lock_user_rows(session, user_id):
+    """Block writes to ``user_id``'s rows until ``session`` commits.
+
+    Every note write locks the note or the user's stats row, and the
+    next-key locks on notes.user_id also hold back new notes.
+    """
+    notes = db.metadata.tables['notes']
+    stats = db.metadata.tables[STATS_TABLE]
+    session.execute(select(notes.c.note_id).where(notes.c.user_id == user_id).with_for_update()).all()
+    session.execute(select(stats.c.user_id).where(stats.c.user_id == user_id).with_for_update()).all()
+
+
+def _delete_rows(user_id, source, batch_size):
+    """Delete ``user_id``'s rows from ``source``, children before parents, without committing.
+
+    Deleting a note first would cascade to its revisions on a source that
+    enforces foreign keys, before they were copied.
+    """
+    for name in reversed(SHARDED_TABLES):
+        table = db.metadata.tables[name]
+        pk = list(table.primary_key.columns)
+        while True:
+            keys = [tuple(row) for row in source.execute(
+                select(*pk).where(table.c.user_id == user_id).limit(batch_size)
+            )]
+            if not keys:
+                break
+            source.execute(delete(table).where(_pk_in(pk, keys)))
+
+
+def move_user_notes(user_id, source, target, batch_size=500):
+    """Move every sharded row of ``user_id`` from the ``source`` to the ``target`` session.
+
+    The user keeps being served from the source throughout the bulk copy.
+    Then the user's source rows are locked, rows that changed since they were
+    copied are synced, and the user's stats row is created on the target,
+    which switches ``ShardRouter.route_for`` to it during a migration. Only
+    then, still under the lock, are the rows deleted from the source.
+
+    An interrupted move can simply be run again. Once the stats row exists on
+    the target the target is authoritative: source rows it lacks are still
+    copied, but rows already on the target win.
+    """
+    stats = db.metadata.tables[STATS_TABLE]
+    switched = target.scalar(select(stats.c.user_id).where(stats.c.user_id == user_id)) is not None
+    target.commit()
+
+    moved = _copy_rows(user_id, source, target, batch_size)
+    if switched:
+        reconcile_user_stats(target, [user_id], include_empty=True)
+    else:
+        _lock_user_rows(source, user_id)
+        moved += _sync_rows(user_id, source, target, batch_size)
+        reconcile_user_stats(target, [user_id], include_empty=True)
+
+    _delete_rows(user_id, source, batch_size)
+    source.commit()
+    return moved
+
+
+def _user_ids(session):
+    user_ids = set()
+    for name in SHARDED_TABLES:
+        table = db.metadata.tables[name]
+        user_ids.update(session.scalars(select(table.c.user_id).distinct()))
+    return sorted(user_ids)
+
+
+def rebalance_shards(batch_size=500, drain=None, user_ids=None):
+    """Move users whose rows are not on the shard the hash ring assigns them.
+
+    Shards in ``NOTES_SHARDS_PREVIOUS`` are drained automatically. ``drain``
+    maps names to URIs of further retired shards whose rows still need moving
+    out. ``user_ids`` limits the run to those users.
+    """
+    if not shards.enabled:
+        raise RuntimeError('NOTES_SHARDS is not configured')
+
+    sources = {name: shards.session_for_shard(name) for name in shards.names}
+    drained = {name: Session(bind=create_engine(uri)) for name, uri in (drain or {}).items()}
+    sources.update(drained)
+
+    users_moved = rows_moved = 0
+    try:
+        for name, source in sources.items():
+            for user_id in _user_ids(source):
+                if user_ids is not None and user_id not in user_ids:
+                    continue
+                target_name = shards.shard_for(user_id)
+                if target_name == name:
+                    continue
+                target = shards.session_for_shard(target_name)
+                rows = move_user_notes(user_id, source, target, batch_size)
+                logger.info("Moved %s rows of user %s from shard %s to %s", rows, user_id, name, target_name)
+                users_moved += 1
+                rows_moved += rows
+    finally:
+        for session in drained.values():
+            session.close()
+            session.get_bind().dispose()
+
+    return users_moved, rows_moved
@@ -0,0 +1,187 @@
+import struct
+import zlib
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+
+from app.models import NoteRevision, db
+from app.utils.sharding import shards
+
+# Delta payload: prefix length and suffix length (in characters) kept from the
+# previous content, followed by the UTF-8 text that replaces the middle.
+_DELTA_HEADER = struct.Struct('>II')
+
+
+def _common_prefix_length(a, b):
+    # Binary search over slice comparisons keeps the scanning in C.
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix_length(a, b, limit):
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def encode_snapshot(content):
+    return zlib.compress((content or '').encode('utf-8'))
+
+
+def decode_snapshot(payload):
+    return zlib.decompress(payload).decode('utf-8')
+
+
+def encode_delta(old, new):
+    old, new = old or '', new or ''
+    prefix = _common_prefix_length(old, new)
+    suffix = _common_suffix_length(old, new, min(len(old), len(new)) - prefix)
+    middle = new[prefix:len(new) - suffix].encode('utf-8')
+    return zlib.compress(_DELTA_HEADER.pack(prefix, suffix) + middle)
+
+
+def apply_delta(old, payload):
+    data = zlib.decompress(payload)
+    prefix, suffix = _DELTA_HEADER.unpack_from(data)
+    middle = data[_DELTA_HEADER.size:].decode('utf-8')
+    return old[:prefix] + middle + old[len(old) - suffix:]
+
+
+def reconstruct(session, note_id, revision_no):
+    """Return ``(title, content)`` of a revision, or ``None`` if it is not stored.
+
+    Reads the nearest snapshot at or before ``revision_no`` and replays at most
+    ``NOTE_REVISION_SNAPSHOT_EVERY - 1`` deltas on top of it.
+    """
+    snapshot_no = (
+        select(func.max(NoteRevision.revision_no))
+        .where(
+            NoteRevision.note_id == note_id,
+            NoteRevision.revision_no <= revision_no,
+            NoteRevision.is_snapshot.is_(True)
+        )
+        .scalar_subquery()
+    )
+    rows = session.execute(
+        select(NoteRevision.revision_no, NoteRevision.note_title, NoteRevision.is_snapshot, NoteRevision.payload)
+        .where(
+            NoteRevision.note_id == note_id,
+            NoteRevision.revision_no.between(snapshot_no, revision_no)
+        )
+        .order_by(NoteRevision.revision_no)
+    ).all()
+    if not rows or rows[-1].revision_no != revision_no:
+        return None
+
+    content = ''
+    for row in rows:
+        content = decode_snapshot(row.payload) if row.is_snapshot else apply_delta(content, row.payload)
+    return rows[-1].note_title, content
+
+
+def _add_revision(session, note, revision_no, title, content, previous_content):
+    snapshot = (revision_no - 1) % current_app.config['NOTE_REVISION_SNAPSHOT_EVERY'] == 0
+    session.add(NoteRevision(
+        note_id=note.note_id,
+        revision_no=revision_no,
+        user_id=note.user_id,
+        note_title=title,
+        is_snapshot=snapshot,
+        payload=encode_snapshot(content) if snapshot else encode_delta(previous_content, content),
+        content_size=len((content or '').encode('utf-8'))
+    ))
+
+
+def record_revision(session, note, previous_title=None, previous_content=None):
+    """Store the note's current state as its next revision, in the caller's transaction.
+
+    ``previous_*`` describe the state before this write (omit them for a new
+    note). Notes that predate revision history get that state recorded first.
+    For an existing note the caller must have loaded it ``with_for_update()``:
+    the delta is built against ``previous_content``, so it has to be the
+    latest committed content.
+    """
+    oldest, latest = session.execute(
+        select(func.min(NoteRevision.revision_no), func.max(NoteRevision.revision_no))
+        .where(NoteRevision.note_id == note.note_id)
+    ).one()
+
+    if latest is None:
+        latest = 0
+        if previous_title is not None:
+            _add_revision(session, note, 1, previous_title, previous_content, None)
+            oldest = latest = 1
+
+    revision_no = latest + 1
+    _add_revision(session, note, revision_no, note.note_title, note.note_content, previous_content)
+
+    # Prune once a whole snapshot interval has accumulated past the retention
+    # limit, so the cost of rebasing the oldest revision is amortised.
+    config = current_app.config
+    if oldest and revision_no - oldest + 1 > config['NOTE_REVISION_RETENTION'] + config['NOTE_REVISION_SNAPSHOT_EVERY']:
+        session.flush()
+        compact_revisions(session, note.note_id, config['NOTE_REVISION_RETENTION'])
+    return revision_no
+
+
+def compact_revisions(session, note_id, keep):
+    """Drop all but the newest ``keep`` revisions, rebasing the oldest kept one to a snapshot."""
+    latest = session.scalar(
+        select(func.max(NoteRevision.revision_no)).where(NoteRevision.note_id == note_id)
+    )
+    if latest is None:
+        return 0
+    first_kept = latest - keep + 1
+
+    rebased = session.get(NoteRevision, (note_id, first_kept))
+    if rebased is None:
+        return 0
+    if not rebased.is_snapshot:
+        _, content = reconstruct(session, note_id, first_kept)
+        rebased.is_snapshot = True
+        rebased.payload = encode_snapshot(content)
+        session.flush()
+
+    return session.execute(
+        delete(NoteRevision)
+        .where(NoteRevision.note_id == note_id, NoteRevision.revision_no < first_kept)
+    ).rowcount
+
+
+def delete_revisions(session, note_id):
+    session.execute(delete(NoteRevision).where(NoteRevision.note_id == note_id))
+
+
+def compact_all_revisions(keep=None, batch_size=100):
+    """Apply the retention limit to every note on every shard; returns revisions deleted.
+
+    ``keep`` defaults to ``NOTE_REVISION_RETENTION``. Useful after lowering the
+    limit, since writes only prune notes that are being edited.
+    """
+    keep = current_app.config['NOTE_REVISION_RETENTION'] if keep is None else keep
+    sessions = [shards.session_for_shard(name) for name in shards.names] if shards.enabled else [db.session]
+
+    deleted = 0
+    for session in sessions:
+        note_ids = session.scalars(
+            select(NoteRevision.note_id)
+            .group_by(NoteRevision.note_id)
+            .having(func.count() > keep)
+        ).all()
+        for i, note_id in enumerate(note_ids, 1):
+            deleted += compact_revisions(session, note_id, keep)
+            if i % batch_size == 0:
+                session.commit()
+        session.commit()
+    return deleted
@@ -0,0 +1,111 @@
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models import TokenRevocation, db
+
+# Re-read this far back on every sync so rows written by a worker whose clock
+# lags ours, or committed late, are not missed.
+SYNC_OVERLAP = 60
+
+
+class _State:
+    def __init__(self):
+        self.revoked = {}  # revocation key -> expires_at
+        self.synced_at = None
+        self.lock = threading.Lock()
+
+
+class TokenRevocations:
+    """Token revocations in the ``shared`` bind, so a logout or account deletion
+    on one worker is honoured by all of them.
+
+    Each worker keeps the active revocations in memory and pulls new rows at
+    most every ``TOKEN_REVOCATION_SYNC_INTERVAL`` seconds, so checking a token
+    never costs a query of its own.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['token_revocations'] = _State()
+
+    @property
+    def _state(self):
+        return current_app.extensions['token_revocations']
+
+    @staticmethod
+    def _engine():
+        return db.engines[TokenRevocation.__bind_key__]
+
+    def _store(self, key, expires_at):
+        table = TokenRevocation.__table__
+        now = time.time()
+        with self._engine().begin() as conn:
+            updated = conn.execute(
+                update(table)
+                .where(table.c.revocation_key == key)
+                .values(created_at=now, expires_at=expires_at)
+            )
+            if not updated.rowcount:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert(table).values(revocation_key=key, created_at=now, expires_at=expires_at))
+                except IntegrityError:
+                    pass  # revoked concurrently by another worker
+            conn.execute(delete(table).where(table.c.expires_at <= now))
+
+        state = self._state
+        with state.lock:
+            state.revoked[key] = expires_at
+
+    def revoke_token(self, jti, expires_at):
+        self._store(f"jti:{jti}", expires_at)
+
+    def revoke_user(self, user_id):
+        """Revoke every token issued to ``user_id`` so far, including refresh tokens."""
+        lifetime = current_app.config['JWT_REFRESH_TOKEN_EXPIRES'].total_seconds()
+        self._store(f"user:{user_id}", time.time() + lifetime)
+
+    def _sync(self, now):
+        state = self._state
+        if state.synced_at is not None and now - state.synced_at < current_app.config['TOKEN_REVOCATION_SYNC_INTERVAL']:
+            return
+
+        table = TokenRevocation.__table__
+        query = select(table.c.revocation_key, table.c.expires_at).where(table.c.expires_at > now)
+        if state.synced_at is not None:
+            query = query.where(table.c.created_at >= state.synced_at - SYNC_OVERLAP)
+        with self._engine().connect() as conn:
+            rows = conn.execute(query).all()
+
+        with state.lock:
+            for key in [key for key, expires_at in state.revoked.items() if expires_at <= now]:
+                del state.revoked[key]
+            state.revoked.update(rows)
+            state.synced_at = now
+
+    def is_revoked(self, jwt_payload):
+        now = time.time()
+        self._sync(now)
+        revoked = self._state.revoked
+        return any(
+            revoked.get(key, 0) > now
+            for key in (f"jti:{jwt_payload['jti']}", f"user:{jwt_payload['sub']}")
+        )
+
+    def reset(self):
+        state = self._state
+        with state.lock:
+            state.revoked.clear()
+            state.synced_at = None
+        with self._engine().begin() as conn:
+            conn.execute(delete(TokenRevocation.__table__))
+
+
+revocations = TokenRevocations()
@@ -0,0 +1,161 @@
+import bisect
+import hashlib
+
+from flask import current_app, g
+from sqlalchemy import Column, MetaData, Table, create_engine, select
+from sqlalchemy.orm import Session
+
+from app.models import Note, UserNoteStats, db
+
+# Tables whose rows belong to one user and live on that user's shard.
+SHARDED_TABLES = ('notes', 'note_revisions', 'user_note_stats')
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring: adding or removing a shard only moves ~1/N of users."""
+
+    def __init__(self, nodes, vnodes=64):
+        if not nodes:
+            raise ValueError('HashRing needs at least one node')
+        self._ring = sorted((_hash(f'{node}#{i}'), node) for node in nodes for i in range(vnodes))
+        self._points = [point for point, _ in self._ring]
+
+    def node_for(self, key):
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._ring[index][1]
+
+
+def shard_metadata():
+    """Copies of the sharded tables without foreign keys; users stay on the main database."""
+    metadata = MetaData()
+    for name in SHARDED_TABLES:
+        table = db.metadata.tables[name]
+        Table(name, metadata, *[
+            Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable, index=c.index)
+            for c in table.columns
+        ])
+    return metadata
+
+
+class _ShardState:
+    def __init__(self, engines, ring, previous_ring=None):
+        self.engines = engines
+        self.ring = ring
+        self.previous_ring = previous_ring
+
+
+class ShardRouter:
+    """Routes a user's notes to one of ``NOTES_SHARDS`` by consistent hashing of user_id.
+
+    With no shards configured every lookup returns ``db.session``, so a single
+    database deployment behaves exactly as before.
+
+    While ``NOTES_SHARDS_PREVIOUS`` holds the shard map being migrated from,
+    a user whose shard changed keeps being served from the previous shard
+    until ``rebalance_shards`` has moved them; see ``route_for``.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        shards = app.config.get('NOTES_SHARDS') or {}
+        previous = app.config.get('NOTES_SHARDS_PREVIOUS') or {}
+        state = None
+        if shards:
+            vnodes = app.config['NOTES_SHARD_VNODES']
+            engines = {name: create_engine(uri) for name, uri in {**previous, **shards}.items()}
+            state = _ShardState(
+                engines,
+                HashRing(list(shards), vnodes),
+                HashRing(list(previous), vnodes) if previous else None
+            )
+        app.extensions['shard_router'] = state
+        app.teardown_appcontext(self._close_sessions)
+
+    @property
+    def _state(self):
+        return current_app.extensions['shard_router']
+
+    @property
+    def enabled(self):
+        return self._state is not None
+
+    @property
+    def names(self):
+        """Every shard holding rows, including those only in ``NOTES_SHARDS_PREVIOUS``."""
+        return list(self._state.engines) if self.enabled else []
+
+    def shard_for(self, user_id):
+        """The shard the hash ring assigns ``user_id`` to, i.e. where their rows belong."""
+        return self._state.ring.node_for(user_id) if self.enabled else None
+
+    def route_for(self, user_id):
+        """The shard currently serving ``user_id``.
+
+        During a migration that is the previous shard until the user has been
+        moved: ``move_user_notes`` creates the user's stats row on the new shard
+        once their rows there match the previous shard, so its presence marks
+        the switch. Users with no rows on the previous shard start on the new
+        one straight away.
+        """
+        state = self._state
+        target = state.ring.node_for(user_id)
+        if state.previous_ring is None:
+            return target
+        previous = state.previous_ring.node_for(user_id)
+        if previous == target:
+            return target
+
+        routes = g.setdefault('_shard_routes', {})
+        if user_id not in routes:
+            # Own connections, so these reads never open (and, under REPEATABLE
+            # READ, pin the snapshot of) the request's shard transaction.
+            stats, notes = UserNoteStats.__table__, Note.__table__
+            with state.engines[target].connect() as conn:
+                moved = conn.scalar(select(stats.c.user_id).where(stats.c.user_id == user_id))
+            pending = False
+            if moved is None:
+                with state.engines[previous].connect() as conn:
+                    pending = (
+                        conn.scalar(select(notes.c.note_id).where(notes.c.user_id == user_id).limit(1)) is not None
+                        or conn.scalar(select(stats.c.user_id).where(stats.c.user_id == user_id)) is not None
+                    )
+            routes[user_id] = previous if pending else target
+        return routes[user_id]
+
+    def session_for(self, user_id):
+        if not self.enabled:
+            return db.session
+        return self.session_for_shard(self.route_for(user_id))
+
+    def session_for_shard(self, name):
+        sessions = g.setdefault('_shard_sessions', {})
+        if name not in sessions:
+            sessions[name] = Session(bind=self._state.engines[name])
+        return sessions[name]
+
+    def create_all(self):
+        if not self.enabled:
+            return
+        metadata = shard_metadata()
+        for engine in self._state.engines.values():
+            metadata.create_all(engine)
+
+    @staticmethod
+    def _close_sessions(exc):
+        for session in g.pop('_shard_sessions', {}).values():
+            session.close()
+
+
+shards = ShardRouter()
+
+
+def notes_session(user_id):
+    """Session holding ``user_id``'s notes and note stats."""
+    return shards.session_for(user_id)
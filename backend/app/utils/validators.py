@@ -1,7 +1,53 @@
-from pydantic import ValidationError
+import json
+from functools import lru_cache, wraps
 
-def validate_json(schema, data):
-    try:
-        return schema(**data), None
-    except ValidationError as e:
-        return None, e.errors()
+from flask import abort, current_app, g, jsonify, request
+from pydantic import TypeAdapter, ValidationError
+
+BODY_METHODS = ('POST', 'PUT', 'PATCH')
+
+
+@lru_cache(maxsize=None)
+def get_adapter(schema):
+    """Build the pydantic validator for ``schema`` once per process."""
+    return TypeAdapter(schema)
+
+
+def read_body(limit):
+    """Read the raw request body, refusing anything larger than ``limit`` bytes."""
+    if request.content_length is not None and request.content_length > limit:
+        abort(413, description=f'Request body exceeds {limit} bytes')
+
+    # Chunked bodies carry no Content-Length, so cap the read itself as well.
+    data = request.stream.read(limit + 1)
+    if len(data) > limit:
+        abort(413, description=f'Request body exceeds {limit} bytes')
+    return data
+
+
+def validate_body(schema):
+    """Validate the raw JSON body against ``schema`` in a single parse.
+
+    The view receives the model as ``validated_data`` (``None`` for methods
+    without a body). The raw bytes are kept on ``g.raw_body`` and the model on
+    ``g.validated_body`` for decorators that run inside this one.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request.method not in BODY_METHODS:
+                return fn(*args, validated_data=None, **kwargs)
+
+            if not request.is_json:
+                abort(415, description='Request body must be application/json')
+            g.raw_body = read_body(current_app.config['MAX_JSON_BODY_SIZE'])
+            try:
+                g.validated_body = get_adapter(schema).validate_json(g.raw_body)
+            except ValidationError as e:
+                # Without the inputs: they can hold passwords or megabytes of note.
+                errors = json.loads(e.json(include_url=False, include_input=False))
+                return jsonify({'error': 'Validation failed', 'details': errors}), 400
+
+            return fn(*args, validated_data=g.validated_body, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,107 @@
+"""Note revision history benchmark: storage growth and reconstruction latency.
+
+    python benchmarks/bench_revisions.py [--edits N] [--size BYTES] [--samples N]
+
+Applies ``--edits`` small localized edits to one note, recording a revision
+for each, then compares the stored payload bytes with keeping a full copy of
+every revision, and times ``reconstruct`` for random revisions.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+
+from app import create_app
+from app.config import Config
+from app.models import Note, NoteRevision, User, db
+from app.utils.revisions import reconstruct, record_revision
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    SQLALCHEMY_BINDS = {"shared": "sqlite:///:memory:"}
+    NOTES_SHARDS = {}
+
+
+def edit(content, rng):
+    """Insert, replace or delete a few words somewhere in the note."""
+    pos = rng.randrange(len(content))
+    words = ' '.join(rng.choice(('alpha', 'beta', 'gamma', 'delta', 'omega')) for _ in range(rng.randint(1, 6)))
+    action = rng.random()
+    if action < 0.5:
+        return content[:pos] + words + content[pos:]
+    if action < 0.8:
+        return content[:pos] + words + content[pos + len(words):]
+    return content[:pos] + content[pos + rng.randint(1, 40):]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--edits', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=20 * 1024)
+    parser.add_argument('--samples', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app = create_app(BenchConfig)
+    # Keep every revision so the whole history can be measured.
+    app.config['NOTE_REVISION_RETENTION'] = args.edits + 1
+
+    with app.app_context():
+        db.create_all()
+        user = User(user_name='Bench', user_email='bench@example.com', password='x')
+        db.session.add(user)
+        db.session.flush()
+
+        paragraph = 'The quick brown fox jumps over the lazy dog while the cat watches. '
+        note = Note(note_title='Bench', note_content=(paragraph * (args.size // len(paragraph) + 1))[:args.size],
+                    user_id=user.user_id)
+        db.session.add(note)
+        db.session.flush()
+        record_revision(db.session, note)
+
+        history = [note.note_content]
+        raw_bytes = len(note.note_content.encode('utf-8'))
+        zlib_bytes = len(zlib.compress(note.note_content.encode('utf-8')))
+        started = time.perf_counter()
+        for _ in range(args.edits):
+            previous = note.note_content
+            note.note_content = edit(previous, rng)
+            record_revision(db.session, note, note.note_title, previous)
+            db.session.commit()
+            history.append(note.note_content)
+            encoded = note.note_content.encode('utf-8')
+            raw_bytes += len(encoded)
+            zlib_bytes += len(zlib.compress(encoded))
+        write_us = (time.perf_counter() - started) / args.edits * 1e6
+
+        stored = db.session.scalar(select(func.sum(func.length(NoteRevision.payload))))
+        count = db.session.scalar(select(func.count()).select_from(NoteRevision))
+        print(f"{count} revisions of a ~{args.size // 1024} KB note, "
+              f"snapshot every {app.config['NOTE_REVISION_SNAPSHOT_EVERY']}")
+        print(f"full copies (raw)   {raw_bytes / 1024:10.1f} KB")
+        print(f"full copies (zlib)  {zlib_bytes / 1024:10.1f} KB")
+        print(f"snapshots + deltas  {stored / 1024:10.1f} KB  ({raw_bytes / stored:.0f}x smaller than raw)")
+        print(f"write (record + commit)  {write_us:8.1f} us/op")
+
+        latencies = []
+        for revision_no in (rng.randint(1, count) for _ in range(args.samples)):
+            t0 = time.perf_counter()
+            _, content = reconstruct(db.session, note.note_id, revision_no)
+            latencies.append((time.perf_counter() - t0) * 1e6)
+            assert content == history[revision_no - 1]
+        latencies.sort()
+        print(f"reconstruct p50 {statistics.median(latencies):8.1f} us  "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1]:8.1f} us  max {latencies[-1]:8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Startup benchmark: import time of the ``app`` package and ``create_app()`` time.
+
+    python benchmarks/bench_startup.py [--runs N]
+
+Import time is measured in fresh interpreters so module caches don't hide it.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# create_app() must not need a live database; fall back to SQLite if unset.
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_import(runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', IMPORT_SNIPPET],
+            cwd=BACKEND_DIR, env=os.environ, capture_output=True, text=True, check=True
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def measure_create_app(runs):
+    from app import create_app
+
+    samples = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        create_app()
+        samples.append(time.perf_counter() - t)
+    return samples
+
+
+def report(label, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{label:<12} median {statistics.median(ms):8.1f} ms   min {min(ms):8.1f} ms   max {max(ms):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    report('import app', measure_import(args.runs))
+    report('create_app', measure_create_app(args.runs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Request body validation benchmark for a ~100 KB note create.
+
+    python benchmarks/bench_validation.py [--size BYTES] [--number N]
+
+Compares the old two-pass path (``json.loads`` as done by ``request.get_json()``
+followed by ``schema(**data)``) with validating the raw bytes directly.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.note_schema import NoteCreateSchema
+from app.utils.validators import get_adapter
+
+
+def make_body(size):
+    paragraph = '<p>Lorem ipsum dolor sit amet, "consectetur" adipiscing elit.</p>\n'
+    content = (paragraph * (size // len(paragraph) + 1))[:size]
+    return json.dumps({'note_title': 'Benchmark note', 'note_content': content}).encode('utf-8')
+
+
+def two_pass(raw):
+    return NoteCreateSchema(**json.loads(raw))
+
+
+def raw_bytes(raw):
+    return get_adapter(NoteCreateSchema).validate_json(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=100 * 1024)
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    raw = make_body(args.size)
+    assert two_pass(raw) == raw_bytes(raw)
+    print(f"body: {len(raw)} bytes, {args.number} iterations")
+
+    results = {}
+    for label, fn in (('get_json + schema(**data)', two_pass), ('validate_json(raw)', raw_bytes)):
+        best = min(timeit.repeat(lambda: fn(raw), number=args.number, repeat=5))
+        results[label] = best / args.number * 1e6
+        print(f"{label:<28} {results[label]:8.1f} us/op")
+
+    before, after = results.values()
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Account deletion: users.deleted_at, notes.user_id index and ON DELETE CASCADE
+
+Revision ID: 0001_account_deletion
+Revises:
+Create Date: 2026-10-19 17:11:32
+
+Databases created before migrations existed were built by ``create_all()``,
+so this revision inspects the live schema and only applies what is missing.
+It is a no-op on a database that ``flask init-db`` has just created.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_account_deletion'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+FK_NAME = 'fk_notes_user_id_users'
+# Lets batch mode on SQLite address the unnamed foreign key create_all() made.
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def _user_fk(inspector):
+    for fk in inspector.get_foreign_keys('notes'):
+        if fk['referred_table'] == 'users' and fk['constrained_columns'] == ['user_id']:
+            return fk
+    return None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    if 'users' in tables and 'deleted_at' not in {c['name'] for c in inspector.get_columns('users')}:
+        op.add_column('users', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    if 'notes' not in tables:
+        return
+
+    if not any(ix['column_names'] == ['user_id'] for ix in inspector.get_indexes('notes')):
+        op.create_index('ix_notes_user_id', 'notes', ['user_id'])
+
+    fk = _user_fk(inspector)
+    if fk is None or (fk.get('options') or {}).get('ondelete', '').upper() != 'CASCADE':
+        with op.batch_alter_table('notes', naming_convention=NAMING_CONVENTION) as batch_op:
+            if fk is not None:
+                batch_op.drop_constraint(fk['name'] or FK_NAME, type_='foreignkey')
+            batch_op.create_foreign_key(FK_NAME, 'users', ['user_id'], ['user_id'], ondelete='CASCADE')
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    fk = _user_fk(inspector)
+    if fk is not None:
+        with op.batch_alter_table('notes', naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(fk['name'] or FK_NAME, type_='foreignkey')
+    # MySQL refuses to drop an index a foreign key relies on, so drop it in between.
+    if any(ix['name'] == 'ix_notes_user_id' for ix in inspector.get_indexes('notes')):
+        op.drop_index('ix_notes_user_id', table_name='notes')
+    with op.batch_alter_table('notes') as batch_op:
+        batch_op.create_foreign_key(FK_NAME, 'users', ['user_id'], ['user_id'])
+    op.drop_column('users', 'deleted_at')
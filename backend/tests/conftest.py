@@ -1,22 +1,77 @@
 import pytest
+from sqlalchemy import event
 from app import create_app, db
-from flask import Flask
+from app.utils.revocation import revocations
+from app.config import Config
 
-@pytest.fixture
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    SQLALCHEMY_BINDS = {"shared": "sqlite:///:memory:"}
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    RATELIMIT_BACKEND = "memory"
+    BCRYPT_ROUNDS = 4
+    ACCOUNT_PURGE_IN_BACKGROUND = False
+    TOKEN_REVOCATION_SYNC_INTERVAL = 0
+
+
+def _enable_savepoints(engine):
+    # pysqlite's implicit transaction handling breaks SAVEPOINT; let SQLAlchemy
+    # emit BEGIN itself so nested transactions work.
+    @event.listens_for(engine, "connect")
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def do_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+@pytest.fixture(scope="session")
 def app():
-    app = create_app()
-    app.config.update({
-        "TESTING": True,
-        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
-        "SQLALCHEMY_TRACK_MODIFICATIONS": False
-    })
+    app = create_app(TestConfig)
 
     with app.app_context():
+        for engine in db.engines.values():
+            _enable_savepoints(engine)
         db.create_all()
-        yield app
-        db.session.remove()
+        # Commits inside the app release a savepoint instead of ending the
+        # per-test transaction opened below.
+        db.session.configure(join_transaction_mode="create_savepoint")
+
+    yield app
+
+    with app.app_context():
         db.drop_all()
 
+
+@pytest.fixture(autouse=True)
+def _transaction(app):
+    """Run each test inside one outer transaction that is rolled back afterwards.
+
+    The schema is created once per session; only the default bind is wrapped,
+    state on the ``shared`` bind is cleaned up by the code that writes it.
+    """
+    with app.app_context():
+        engines = db.engines
+        engine = engines[None]
+        connection = engine.connect()
+        transaction = connection.begin()
+        engines[None] = connection
+        try:
+            yield
+        finally:
+            db.session.remove()
+            engines[None] = engine
+            transaction.rollback()
+            connection.close()
+            app.extensions["rate_limiter"].reset()
+            app.extensions["compression"].clear()
+            app.extensions["identity_cache"].clear()
+            revocations.reset()
+
+
 @pytest.fixture
 def client(app):
     return app.test_client()
@@ -0,0 +1,75 @@
+from app.models import AccountDeletion, Note, NoteRevision, User, db
+from app import create_app
+from app.utils.account_purge import purge_account, resume_unfinished_purges
+from conftest import TestConfig
+
+
+def _signup(client, email):
+    res = client.post('/api/auth/signup', json={
+        "user_name": "Leaving",
+        "user_email": email,
+        "password": "test1234",
+        "confirm_password": "test1234"
+    })
+    data = res.get_json()
+    return data['user']['user_id'], {'Authorization': f"Bearer {data['access_token']}"}
+
+
+def test_delete_account_then_purge_in_batches(app, client):
+    user_id, headers = _signup(client, "leaving@example.com")
+    for i in range(5):
+        client.post('/api/notes', headers=headers, json={"note_title": f"Note {i}"})
+    _, other_headers = _signup(client, "staying@example.com")
+    client.post('/api/notes', headers=other_headers, json={"note_title": "Keep me"})
+
+    res = client.delete('/api/auth/me', headers=headers)
+    assert res.status_code == 202
+    deletion_id = res.get_json()['deletion_id']
+
+    assert client.get('/api/notes', headers=headers).status_code == 401
+    res = client.post('/api/auth/signin', json={"user_email": "leaving@example.com", "password": "test1234"})
+    assert res.status_code == 401
+
+    res = client.get(f'/api/auth/deletions/{deletion_id}')
+    assert res.get_json()['status'] == 'pending'
+
+    app.config.update(ACCOUNT_PURGE_BATCH_SIZE=2, ACCOUNT_PURGE_PAUSE=0)
+    try:
+        purge_account(deletion_id)
+    finally:
+        app.config.update(ACCOUNT_PURGE_BATCH_SIZE=1000, ACCOUNT_PURGE_PAUSE=0.1)
+
+    progress = client.get(f'/api/auth/deletions/{deletion_id}').get_json()
+    assert progress['status'] == 'completed'
+    assert progress['notes_total'] == progress['notes_deleted'] == 5
+    assert db.session.get(User, user_id) is None
+    assert Note.query.count() == 1
+    assert NoteRevision.query.filter_by(user_id=user_id).count() == 0
+
+
+def test_resume_unfinished_purges(client):
+    user_id, headers = _signup(client, "resume@example.com")
+    client.post('/api/notes', headers=headers, json={"note_title": "Note"})
+    client.delete('/api/auth/me', headers=headers)
+
+    assert resume_unfinished_purges() == (1, 0)
+    assert AccountDeletion.query.filter_by(user_id=user_id).one().status == 'completed'
+    assert Note.query.filter_by(user_id=user_id).count() == 0
+
+
+def test_deletion_revokes_tokens_on_every_worker(tmp_path):
+    class WorkerConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'main.db'}"
+        SQLALCHEMY_BINDS = {"shared": f"sqlite:///{tmp_path / 'shared.db'}"}
+        RATELIMIT_ENABLED = False
+
+    first, second = create_app(WorkerConfig), create_app(WorkerConfig)
+    with first.app_context():
+        db.create_all()
+
+    _, headers = _signup(first.test_client(), "everywhere@example.com")
+    assert second.test_client().get('/api/notes', headers=headers).status_code == 200
+
+    assert first.test_client().delete('/api/auth/me', headers=headers).status_code == 202
+    assert second.test_client().get('/api/notes', headers=headers).status_code == 401
+    assert second.test_client().post('/api/notes', headers=headers, json={"note_title": "Late"}).status_code == 401
@@ -2,7 +2,8 @@ def test_signup_and_login(client):
     res = client.post('/api/auth/signup', json={
         "user_name": "Test",
         "user_email": "test@example.com",
-        "password": "test1234"
+        "password": "test1234",
+        "confirm_password": "test1234"
     })
     assert res.status_code == 201
     assert 'access_token' in res.get_json()
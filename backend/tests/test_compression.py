@@ -0,0 +1,69 @@
+import gzip
+
+import pytest
+from flask import Response
+
+from app.utils.compression import compress_response
+
+
+@pytest.fixture
+def headers(client):
+    res = client.post('/api/auth/signup', json={
+        "user_name": "Gzip",
+        "user_email": "gzip@example.com",
+        "password": "test1234",
+        "confirm_password": "test1234"
+    })
+    headers = {'Authorization': f"Bearer {res.get_json()['access_token']}"}
+    for i in range(3):
+        client.post('/api/notes', headers=headers, json={
+            "note_title": f"Note {i}",
+            "note_content": "lorem ipsum " * 200
+        })
+    return headers
+
+
+def test_large_json_is_gzipped(client, headers):
+    plain = client.get('/api/notes', headers=headers)
+    assert 'Content-Encoding' not in plain.headers
+
+    res = client.get('/api/notes', headers={**headers, 'Accept-Encoding': 'gzip'})
+    assert res.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in res.headers['Vary']
+    assert gzip.decompress(res.data) == plain.data
+    assert res.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+
+
+def test_small_responses_are_not_compressed(client):
+    res = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in res.headers
+
+
+def test_repeat_hit_reuses_compressed_body(app, client, headers, monkeypatch):
+    calls = []
+    compress = gzip.compress
+
+    def counting_compress(*args, **kwargs):
+        calls.append(1)
+        return compress(*args, **kwargs)
+
+    monkeypatch.setattr(gzip, 'compress', counting_compress)
+    gzip_headers = {**headers, 'Accept-Encoding': 'gzip'}
+    first = client.get('/api/notes', headers=gzip_headers)
+    assert len(calls) == 1
+    assert app.extensions['compression'].size > 0
+
+    second = client.get('/api/notes', headers=gzip_headers)
+    assert second.data == first.data
+    assert len(calls) == 1
+
+    res = client.get('/api/notes', headers={**gzip_headers, 'If-None-Match': first.headers['ETag']})
+    assert res.status_code == 304
+
+
+def test_streamed_response_is_compressed(app):
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        chunks = [b'[', b'{"a": 1}', b', {"b": 2}', b']']
+        response = compress_response(Response(iter(chunks), mimetype='application/json'))
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(b''.join(response.response)) == b''.join(chunks)
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+import pytest
+
+from app.models import IdempotencyKey, Note, db
+from app.utils.idempotency import claim, complete, make_fingerprint, make_key_hash
+
+
+@pytest.fixture
+def user(client):
+    res = client.post('/api/auth/signup', json={
+        "user_name": "Retry",
+        "user_email": "retry@example.com",
+        "password": "test1234",
+        "confirm_password": "test1234"
+    })
+    data = res.get_json()
+    return data['user']['user_id'], {'Authorization': f"Bearer {data['access_token']}"}
+
+
+def test_retried_note_create_is_replayed(client, user):
+    _, headers = user
+    retry_headers = {**headers, 'Idempotency-Key': str(uuid.uuid4())}
+    body = {"note_title": "Once", "note_content": "only once"}
+
+    first = client.post('/api/notes', headers=retry_headers, json=body)
+    second = client.post('/api/notes', headers=retry_headers, json=body)
+    assert first.status_code == second.status_code == 201
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert second.get_json() == first.get_json()
+    assert Note.query.filter_by(note_title="Once").count() == 1
+
+    res = client.post('/api/notes', headers=retry_headers, json={"note_title": "Different"})
+    assert res.status_code == 422
+
+
+def test_retried_signup_is_replayed(client):
+    key = str(uuid.uuid4())
+    key_headers = {'Idempotency-Key': key}
+    body = {
+        "user_name": "Once",
+        "user_email": "once@example.com",
+        "password": "test1234",
+        "confirm_password": "test1234"
+    }
+    raw = json.dumps(body).encode('utf-8')
+    first = client.post('/api/auth/signup', headers=key_headers, data=raw, content_type='application/json')
+    second = client.post('/api/auth/signup', headers=key_headers, data=raw, content_type='application/json')
+    assert second.status_code == 201
+    assert second.get_json()['user'] == first.get_json()['user']
+
+    # Neither the tokens nor a plain hash of the body (with its password) is stored.
+    table = IdempotencyKey.__table__
+    key_hash = make_key_hash('anonymous', 'POST', '/api/auth/signup', key)
+    with db.engines['shared'].connect() as conn:
+        row = conn.execute(table.select().where(table.c.key_hash == key_hash)).one()
+    assert first.get_json()['access_token'].encode() not in row.response_body
+    assert b'refresh_token' not in row.response_body
+    assert row.fingerprint != hashlib.sha256(raw).hexdigest()
+
+    # The replay carries fresh, working tokens.
+    token = second.get_json()['access_token']
+    res = client.get('/api/auth/me', headers={'Authorization': f"Bearer {token}"})
+    assert res.status_code == 200
+
+
+def test_concurrent_duplicate_waits_for_first(app, client, user):
+    user_id, headers = user
+    body = b'{"note_title": "Concurrent"}'
+    first = client.post('/api/notes', headers=headers, data=body, content_type='application/json')
+
+    # Another request already holds this key and finishes shortly.
+    key = str(uuid.uuid4())
+    key_hash = make_key_hash(f"user:{user_id}", 'POST', '/api/notes', key)
+    assert claim(key_hash, make_fingerprint(body)) is None
+
+    def finish():
+        time.sleep(0.1)
+        with app.app_context():
+            complete(key_hash, first)
+
+    thread = threading.Thread(target=finish)
+    thread.start()
+    res = client.post('/api/notes', headers={**headers, 'Idempotency-Key': key}, data=body,
+                      content_type='application/json')
+    thread.join()
+    assert res.status_code == 201
+    assert res.headers['Idempotent-Replayed'] == 'true'
+    assert Note.query.filter_by(note_title="Concurrent").count() == 1
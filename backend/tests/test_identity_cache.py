@@ -0,0 +1,107 @@
+import pytest
+
+from app import create_app
+from app.models import User, db
+from app.utils.identity_cache import MemoryBackend, SQLBackend
+from conftest import TestConfig
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_backend_ttl_and_lru():
+    clock = FakeClock()
+    cache = MemoryBackend(ttl=10, max_entries=2, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    clock.now += 10
+    assert cache.get('a') is None
+
+
+def test_sql_backend_roundtrip(app):
+    clock = FakeClock()
+    cache = SQLBackend(ttl=10, max_entries=100, clock=clock)
+    cache.set('user:1', {'user_name': 'A'})
+    cache.set('user:1', {'user_name': 'B'})
+    assert cache.get('user:1') == {'user_name': 'B'}
+
+    clock.now += 10
+    assert cache.get('user:1') is None
+    cache.set('user:1', {'user_name': 'C'})
+    cache.delete('user:1')
+    assert cache.get('user:1') is None
+    cache.clear()
+
+
+@pytest.mark.parametrize('backend', [MemoryBackend, SQLBackend])
+def test_invalidation_blocks_stale_fills(app, backend):
+    clock = FakeClock()
+    cache = backend(ttl=100, max_entries=10, tombstone_ttl=5, clock=clock)
+    try:
+        cache.set('user:1', {'user_name': 'Old'})
+        # A read fetched the old row, then an update invalidated the entry
+        # before the read filled the cache.
+        cache.delete('user:1')
+        cache.set('user:1', {'user_name': 'Old'})
+        assert cache.get('user:1') is None
+
+        clock.now += 5
+        cache.set('user:1', {'user_name': 'New'})
+        assert cache.get('user:1') == {'user_name': 'New'}
+    finally:
+        cache.clear()
+
+
+def test_sql_backend_evicts_least_recently_used(app):
+    clock = FakeClock()
+    cache = SQLBackend(ttl=100, max_entries=3, clock=clock)
+    try:
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+            clock.now += 20
+        cache.get('a')  # old enough to be touched
+        cache.set('d', 'd')
+        assert [cache.get(key) for key in ('a', 'b', 'c', 'd')] == ['a', None, 'c', 'd']
+    finally:
+        cache.clear()
+
+
+def test_sql_backend_requires_a_separate_store():
+    class SameDatabaseConfig(TestConfig):
+        SQLALCHEMY_BINDS = {"shared": TestConfig.SQLALCHEMY_DATABASE_URI}
+        IDENTITY_CACHE_BACKEND = "sql"
+
+    with pytest.raises(ValueError):
+        create_app(SameDatabaseConfig)
+
+
+def test_me_is_cached_and_invalidated_on_update(client):
+    res = client.post('/api/auth/signup', json={
+        "user_name": "Cached",
+        "user_email": "cached@example.com",
+        "password": "test1234",
+        "confirm_password": "test1234"
+    })
+    data = res.get_json()
+    headers = {'Authorization': f"Bearer {data['access_token']}"}
+
+    assert client.get('/api/auth/me', headers=headers).get_json()['user_name'] == 'Cached'
+
+    # Changed behind the cache's back: still served from the cache.
+    db.session.get(User, data['user']['user_id']).user_name = 'Stale'
+    db.session.commit()
+    assert client.get('/api/auth/me', headers=headers).get_json()['user_name'] == 'Cached'
+
+    res = client.put('/api/auth/me', headers=headers, json={"user_name": "Renamed"})
+    assert res.status_code == 200
+    assert client.get('/api/auth/me', headers=headers).get_json()['user_name'] == 'Renamed'
@@ -0,0 +1,79 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app import create_app, db
+from conftest import TestConfig
+
+# The schema create_all() built before account deletion existed.
+BASELINE_SCHEMA = [
+    """CREATE TABLE users (
+        user_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        user_name VARCHAR(100) NOT NULL,
+        user_email VARCHAR(120) NOT NULL UNIQUE,
+        password VARCHAR(255) NOT NULL,
+        last_update DATETIME,
+        created_on DATETIME
+    )""",
+    """CREATE TABLE notes (
+        note_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        note_title VARCHAR(200) NOT NULL,
+        note_content TEXT,
+        last_update DATETIME,
+        created_on DATETIME,
+        user_id VARCHAR(36) NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES users (user_id)
+    )""",
+]
+
+
+def _init_db(tmp_path):
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'main.db'}"
+        SQLALCHEMY_BINDS = {"shared": f"sqlite:///{tmp_path / 'shared.db'}"}
+
+    app = create_app(FileConfig)
+    # Push this app's context; otherwise the command runs against the test app's.
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=['init-db'])
+        for engine in db.engines.values():
+            engine.dispose()
+    return result
+
+
+def test_init_db_upgrades_a_baseline_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'main.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text(
+            "INSERT INTO users (user_id, user_name, user_email, password) "
+            "VALUES ('u1', 'Old', 'old@example.com', 'x')"
+        ))
+        conn.execute(text("INSERT INTO notes (note_id, note_title, user_id) VALUES ('n1', 'Kept', 'u1')"))
+
+    result = _init_db(tmp_path)
+    assert result.exit_code == 0, result.output
+
+    inspector = inspect(engine)
+    assert 'deleted_at' in {c['name'] for c in inspector.get_columns('users')}
+    assert any(ix['column_names'] == ['user_id'] for ix in inspector.get_indexes('notes'))
+    [fk] = inspector.get_foreign_keys('notes')
+    assert fk['options']['ondelete'] == 'CASCADE'
+    assert 'account_deletions' in inspector.get_table_names()
+    with engine.connect() as conn:
+        assert conn.scalar(text("SELECT note_title FROM notes WHERE user_id = 'u1'")) == 'Kept'
+
+    # Running it again, as every deploy does, changes nothing.
+    assert _init_db(tmp_path).exit_code == 0
+    engine.dispose()
+
+
+def test_init_db_on_an_empty_database(tmp_path):
+    result = _init_db(tmp_path)
+    assert result.exit_code == 0, result.output
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'main.db'}")
+    inspector = inspect(engine)
+    assert 'deleted_at' in {c['name'] for c in inspector.get_columns('users')}
+    with engine.connect() as conn:
+        assert conn.scalar(text("SELECT version_num FROM alembic_version")) == '0001_account_deletion'
+    engine.dispose()
@@ -0,0 +1,80 @@
+from app.models import Note, UserNoteStats, db
+from app.utils import note_stats
+from app.utils.note_stats import reconcile_note_stats
+
+
+def _signup(client, email):
+    res = client.post('/api/auth/signup', json={
+        "user_name": "Stats",
+        "user_email": email,
+        "password": "test1234",
+        "confirm_password": "test1234"
+    })
+    data = res.get_json()
+    return data['user']['user_id'], {'Authorization': f"Bearer {data['access_token']}"}
+
+
+def _stats(client, headers):
+    return client.get('/api/notes/stats', headers=headers).get_json()['stats']
+
+
+def test_stats_follow_note_writes(client):
+    _, headers = _signup(client, "stats@example.com")
+    assert _stats(client, headers)['note_count'] == 0
+
+    res = client.post('/api/notes', headers=headers, json={"note_title": "A", "note_content": "héllo"})
+    note_id = res.get_json()['note']['note_id']
+    client.post('/api/notes', headers=headers, json={"note_title": "B", "note_content": "abc"})
+    stats = _stats(client, headers)
+    assert stats['note_count'] == 2
+    assert stats['content_bytes'] == 9
+    assert stats['last_activity'] is not None
+
+    client.put(f'/api/notes/{note_id}', headers=headers, json={"note_content": "hi"})
+    assert _stats(client, headers)['content_bytes'] == 5
+
+    client.delete(f'/api/notes/{note_id}', headers=headers)
+    stats = _stats(client, headers)
+    assert stats['note_count'] == 1
+    assert stats['content_bytes'] == 3
+
+
+def test_reconcile_repairs_drift(client):
+    user_id, headers = _signup(client, "drift@example.com")
+    client.post('/api/notes', headers=headers, json={"note_title": "A", "note_content": "1234"})
+    # Notes written behind the app's back, e.g. by an import script.
+    db.session.add(Note(note_title="B", note_content="56", user_id=user_id))
+    db.session.commit()
+    assert _stats(client, headers)['note_count'] == 1
+
+    assert reconcile_note_stats(batch_size=1) == 1
+    stats = db.session.get(UserNoteStats, user_id)
+    assert (stats.note_count, stats.content_bytes) == (2, 6)
+
+
+def test_reconcile_locks_before_reading(client, monkeypatch):
+    _signup(client, "snapshot@example.com")
+    reconcile_user_stats = note_stats.reconcile_user_stats
+    in_transaction = []
+
+    def check(session, user_ids, **kwargs):
+        # Paging the users must not leave a transaction (and its snapshot) open.
+        in_transaction.append(db.session().in_transaction())
+        return reconcile_user_stats(session, user_ids, **kwargs)
+
+    monkeypatch.setattr(note_stats, 'reconcile_user_stats', check)
+    reconcile_note_stats(batch_size=1)
+    assert in_transaction and not any(in_transaction)
+
+
+def test_first_read_seeds_stats_row(client):
+    user_id, headers = _signup(client, "reader@example.com")
+    # Notes written before stats existed, so the user has no stats row.
+    db.session.add(Note(note_title="Old", note_content="abcd", user_id=user_id))
+    db.session.commit()
+    assert db.session.get(UserNoteStats, user_id) is None
+
+    assert _stats(client, headers)['content_bytes'] == 4
+    db.session.expire_all()
+    stats = db.session.get(UserNoteStats, user_id)
+    assert (stats.note_count, stats.content_bytes) == (1, 4)
@@ -2,7 +2,8 @@ def test_notes_crud(client):
     client.post('/api/auth/signup', json={
         "user_name": "User",
         "user_email": "user@example.com",
-        "password": "test1234"
+        "password": "test1234",
+        "confirm_password": "test1234"
     })
     res = client.post('/api/auth/signin', json={
         "user_email": "user@example.com",
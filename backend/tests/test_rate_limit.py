@@ -0,0 +1,53 @@
+from app.utils.rate_limiter import MemoryBackend, SQLBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_bucket_refills():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+
+    assert all(backend.consume('k', 3, 1.0)[0] for _ in range(3))
+    allowed, retry_after = backend.consume('k', 3, 1.0)
+    assert not allowed
+    assert retry_after == 1.0
+
+    clock.now += 1
+    assert backend.consume('k', 3, 1.0)[0]
+    assert backend.consume('other', 3, 1.0)[0]
+
+
+def test_memory_evicts_least_recently_used():
+    clock = FakeClock()
+    backend = MemoryBackend(max_keys=2, clock=clock)
+    backend.consume('a', 2, 1.0)
+    backend.consume('b', 2, 1.0)
+    backend.consume('a', 2, 1.0)
+    backend.consume('c', 2, 1.0)
+    assert list(backend._buckets) == ['a', 'c']
+
+
+def test_sql_bucket_is_shared(app):
+    clock = FakeClock()
+    first, second = SQLBackend(clock=clock), SQLBackend(clock=clock)
+
+    assert first.consume('k', 2, 1.0)[0]
+    assert second.consume('k', 2, 1.0)[0]
+    assert not first.consume('k', 2, 1.0)[0]
+    first.reset()
+
+
+def test_signin_is_rate_limited(client):
+    payload = {"user_email": "nobody@example.com", "password": "wrong-password"}
+    for _ in range(5):
+        assert client.post('/api/auth/signin', json=payload).status_code == 401
+
+    res = client.post('/api/auth/signin', json=payload)
+    assert res.status_code == 429
+    assert int(res.headers['Retry-After']) >= 1
@@ -0,0 +1,162 @@
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app import create_app
+from app.models import NoteRevision, db
+from app.routes import notes_routes
+from app.utils.revisions import apply_delta, compact_all_revisions, encode_delta
+from conftest import TestConfig
+
+
+def _signup(client, email):
+    res = client.post('/api/auth/signup', json={
+        "user_name": "Revisions",
+        "user_email": email,
+        "password": "test1234",
+        "confirm_password": "test1234"
+    })
+    return {'Authorization': f"Bearer {res.get_json()['access_token']}"}
+
+
+def _create(client, headers, content):
+    res = client.post('/api/notes', headers=headers, json={"note_title": "Draft", "note_content": content})
+    return res.get_json()['note']['note_id']
+
+
+def test_delta_round_trip():
+    cases = [
+        ("", "hello"),
+        ("hello", ""),
+        ("hello world", "hello brave new world"),
+        ("aaaa", "aaaaaa"),
+        ("naïve café", "naïve crème café"),
+        ("same", "same"),
+    ]
+    for old, new in cases:
+        assert apply_delta(old, encode_delta(old, new)) == new
+
+
+def test_list_get_and_restore(client):
+    headers = _signup(client, "revisions@example.com")
+    note_id = _create(client, headers, "v1")
+    client.put(f'/api/notes/{note_id}', headers=headers, json={"note_content": "v2"})
+    client.put(f'/api/notes/{note_id}', headers=headers, json={"note_title": "Final", "note_content": "v3"})
+    # Unchanged writes do not add a revision.
+    client.put(f'/api/notes/{note_id}', headers=headers, json={"note_content": "v3"})
+
+    res = client.get(f'/api/notes/{note_id}/revisions', headers=headers)
+    revisions = res.get_json()['revisions']
+    assert [r['revision_no'] for r in revisions] == [3, 2, 1]
+    assert revisions[0]['note_title'] == "Final"
+    assert 'note_content' not in revisions[0]
+
+    res = client.get(f'/api/notes/{note_id}/revisions/2', headers=headers)
+    assert res.get_json()['revision']['note_content'] == "v2"
+
+    res = client.post(f'/api/notes/{note_id}/revisions/1/restore', headers=headers)
+    assert res.status_code == 200
+    assert res.get_json()['note']['note_content'] == "v1"
+    assert res.get_json()['note']['note_title'] == "Draft"
+    revisions = client.get(f'/api/notes/{note_id}/revisions', headers=headers).get_json()['revisions']
+    assert revisions[0]['revision_no'] == 4
+
+    assert client.get(f'/api/notes/{note_id}/revisions/9', headers=headers).status_code == 404
+    other = _signup(client, "other-revisions@example.com")
+    assert client.get(f'/api/notes/{note_id}/revisions', headers=other).status_code == 404
+    assert client.get(f'/api/notes/{note_id}/revisions/1', headers=other).status_code == 404
+
+
+def test_snapshots_and_retention(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'NOTE_REVISION_SNAPSHOT_EVERY', 3)
+    monkeypatch.setitem(app.config, 'NOTE_REVISION_RETENTION', 4)
+    headers = _signup(client, "retention@example.com")
+    note_id = _create(client, headers, "edit 1")
+    for i in range(2, 13):
+        client.put(f'/api/notes/{note_id}', headers=headers, json={"note_content": f"edit {i}"})
+
+    stored = db.session.query(NoteRevision).filter_by(note_id=note_id).order_by(NoteRevision.revision_no).all()
+    # Pruned back to the newest 4 whenever 4 + 3 revisions have accumulated.
+    assert [r.revision_no for r in stored] == [9, 10, 11, 12]
+    assert [r.revision_no for r in stored if r.is_snapshot] == [9, 10]
+
+    for r in stored:
+        res = client.get(f'/api/notes/{note_id}/revisions/{r.revision_no}', headers=headers)
+        assert res.get_json()['revision']['note_content'] == f"edit {r.revision_no}"
+
+    assert compact_all_revisions(keep=2) == 2
+    revisions = client.get(f'/api/notes/{note_id}/revisions', headers=headers).get_json()['revisions']
+    assert [r['revision_no'] for r in revisions] == [12, 11]
+    res = client.get(f'/api/notes/{note_id}/revisions/11', headers=headers)
+    assert res.get_json()['revision']['note_content'] == "edit 11"
+
+
+def test_deleting_a_note_drops_its_revisions(client):
+    headers = _signup(client, "drop-revisions@example.com")
+    note_id = _create(client, headers, "gone")
+    client.put(f'/api/notes/{note_id}', headers=headers, json={"note_content": "soon"})
+    client.delete(f'/api/notes/{note_id}', headers=headers)
+    assert db.session.query(NoteRevision).filter_by(note_id=note_id).count() == 0
+
+
+def _emulate_row_locks(orm_execute_state):
+    # SQLite drops FOR UPDATE; a no-op write takes its database write lock,
+    # which blocks the other writer just as the row lock would.
+    if orm_execute_state.is_select and orm_execute_state.statement._for_update_arg is not None:
+        orm_execute_state.session.execute(text("UPDATE notes SET note_id = note_id WHERE 0"))
+
+
+def test_overlapping_edits_keep_history_consistent(tmp_path, monkeypatch):
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'main.db'}"
+        SQLALCHEMY_BINDS = {"shared": f"sqlite:///{tmp_path / 'shared.db'}"}
+        RATELIMIT_ENABLED = False
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    headers = _signup(client, "overlap@example.com")
+    note_id = _create(client, headers, "hello world")
+
+    # The first writer pauses between loading the note and recording its
+    # revision; the second starts right then.
+    first_loaded = threading.Event()
+    record_revision = notes_routes.record_revision
+
+    def slow_record_revision(*args, **kwargs):
+        if not first_loaded.is_set():
+            first_loaded.set()
+            time.sleep(0.3)
+        return record_revision(*args, **kwargs)
+
+    monkeypatch.setattr(notes_routes, 'record_revision', slow_record_revision)
+    event.listen(Session, 'do_orm_execute', _emulate_row_locks)
+    try:
+        statuses = []
+
+        def edit(content):
+            res = app.test_client().put(f'/api/notes/{note_id}', headers=headers, json={"note_content": content})
+            statuses.append(res.status_code)
+
+        first = threading.Thread(target=edit, args=("hello",))
+        first.start()
+        first_loaded.wait(5)
+        edit("hello world!")
+        first.join()
+    finally:
+        event.remove(Session, 'do_orm_execute', _emulate_row_locks)
+
+    assert statuses == [200, 200]
+    note = client.get(f'/api/notes/{note_id}', headers=headers).get_json()['note']
+    assert note['note_content'] == "hello world!"
+    contents = [
+        client.get(f'/api/notes/{note_id}/revisions/{n}', headers=headers).get_json()['revision']['note_content']
+        for n in (1, 2, 3)
+    ]
+    assert contents == ["hello world", "hello", "hello world!"]
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
@@ -0,0 +1,238 @@
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+
+from app import create_app, db
+from app.utils import resharding
+from app.utils.resharding import rebalance_shards
+from app.utils.sharding import HashRing, shards
+from conftest import TestConfig
+
+GROWN_RING = HashRing(['a', 'b', 'c'], TestConfig.NOTES_SHARD_VNODES)
+
+
+def test_hash_ring_moves_few_keys_when_a_node_is_added():
+    keys = [f'user-{i}' for i in range(2000)]
+    before = HashRing(['a', 'b', 'c'])
+    after = HashRing(['a', 'b', 'c', 'd'])
+
+    moved = [k for k in keys if before.node_for(k) != after.node_for(k)]
+    assert all(after.node_for(k) == 'd' for k in moved)
+    assert 0.1 < len(moved) / len(keys) < 0.4
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    def make(shard_names, previous=()):
+        class ShardedConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'main.db'}"
+            SQLALCHEMY_BINDS = {"shared": f"sqlite:///{tmp_path / 'shared.db'}"}
+            NOTES_SHARDS = {name: f"sqlite:///{tmp_path / name}.db" for name in shard_names}
+            NOTES_SHARDS_PREVIOUS = {name: f"sqlite:///{tmp_path / name}.db" for name in previous}
+            RATELIMIT_ENABLED = False
+
+        app = create_app(ShardedConfig)
+        with app.app_context():
+            db.create_all()
+            shards.create_all()
+        return app
+    return make
+
+
+def _note_owners(tmp_path, name):
+    engine = create_engine(f"sqlite:///{tmp_path / name}.db")
+    with engine.connect() as conn:
+        owners = [row[0] for row in conn.execute(text("SELECT user_id FROM notes"))]
+    engine.dispose()
+    return owners
+
+
+def _notes(client, headers):
+    return client.get('/api/notes', headers=headers).get_json()['notes']
+
+
+def test_notes_are_routed_and_rebalanced(make_app, tmp_path):
+    app = make_app(['a', 'b'])
+    client = app.test_client()
+
+    users = {}
+    # User ids are random; sign up until at least one will move to 'c'.
+    i = 0
+    while len(users) < 8 or not any(GROWN_RING.node_for(u) == 'c' for u in users):
+        i += 1
+        res = client.post('/api/auth/signup', json={
+            "user_name": f"User {i}",
+            "user_email": f"shard{i}@example.com",
+            "password": "test1234",
+            "confirm_password": "test1234"
+        })
+        data = res.get_json()
+        headers = {'Authorization': f"Bearer {data['access_token']}"}
+        users[data['user']['user_id']] = headers
+        for j in range(2):
+            assert client.post('/api/notes', headers=headers, json={"note_title": f"N{j}"}).status_code == 201
+
+    with app.app_context():
+        placement = {user_id: shards.shard_for(user_id) for user_id in users}
+    for name in ('a', 'b'):
+        assert sorted(set(_note_owners(tmp_path, name))) == sorted(u for u, s in placement.items() if s == name)
+    for headers in users.values():
+        assert len(_notes(client, headers)) == 2
+
+    # Add a shard: users the ring now assigns to 'c' are moved there.
+    app = make_app(['a', 'b', 'c'])
+    client = app.test_client()
+    with app.app_context():
+        new_placement = {user_id: shards.shard_for(user_id) for user_id in users}
+        movers = [u for u in users if new_placement[u] != placement[u]]
+        assert movers
+        users_moved, rows_moved = rebalance_shards(batch_size=1)
+    # Two notes plus their creation revisions per user.
+    assert (users_moved, rows_moved) == (len(movers), 4 * len(movers))
+
+    for name in ('a', 'b', 'c'):
+        assert set(_note_owners(tmp_path, name)) == {u for u, s in new_placement.items() if s == name}
+    for headers in users.values():
+        assert len(_notes(client, headers)) == 2
+        stats = client.get('/api/notes/stats', headers=headers).get_json()['stats']
+        assert stats['note_count'] == 2
+
+    # Retire 'b': its users move to the remaining shards.
+    app = make_app(['a', 'c'])
+    client = app.test_client()
+    with app.app_context():
+        rebalance_shards(drain={'b': f"sqlite:///{tmp_path / 'b'}.db"})
+    assert _note_owners(tmp_path, 'b') == []
+    for headers in users.values():
+        assert len(_notes(client, headers)) == 2
+
+
+def test_users_are_served_from_the_previous_shard_until_moved(make_app, tmp_path):
+    app = make_app(['a', 'b'])
+    client = app.test_client()
+    users = {}
+    i = 0
+    while len(users) < 8 or not any(GROWN_RING.node_for(u) == 'c' for u in users):
+        i += 1
+        res = client.post('/api/auth/signup', json={
+            "user_name": f"User {i}",
+            "user_email": f"migrating{i}@example.com",
+            "password": "test1234",
+            "confirm_password": "test1234"
+        })
+        data = res.get_json()
+        headers = {'Authorization': f"Bearer {data['access_token']}"}
+        note = client.post('/api/notes', headers=headers, json={"note_title": "Before"}).get_json()['note']
+        users[data['user']['user_id']] = (headers, note['note_id'])
+
+    app = make_app(['a', 'b', 'c'], previous=['a', 'b'])
+    client = app.test_client()
+    with app.app_context():
+        movers = [u for u in users if shards.shard_for(u) == 'c']
+    assert movers
+
+    # Not moved yet: notes are still found, and edits land next to them.
+    for headers, note_id in users.values():
+        assert [n['note_title'] for n in _notes(client, headers)] == ['Before']
+        res = client.put(f'/api/notes/{note_id}', headers=headers, json={"note_title": "During"})
+        assert res.status_code == 200
+    assert _note_owners(tmp_path, 'c') == []
+
+    with app.app_context():
+        users_moved, _ = rebalance_shards()
+    assert users_moved == len(movers)
+    assert set(_note_owners(tmp_path, 'c')) == set(movers)
+    for headers, _ in users.values():
+        assert [n['note_title'] for n in _notes(client, headers)] == ['During']
+        assert client.get('/api/notes/stats', headers=headers).get_json()['stats']['note_count'] == 1
+
+    # Migration finished: dropping the previous map changes nothing for users.
+    client = make_app(['a', 'b', 'c']).test_client()
+    for headers, _ in users.values():
+        assert [n['note_title'] for n in _notes(client, headers)] == ['During']
+
+
+def test_users_can_read_and_edit_during_their_move(make_app, tmp_path, monkeypatch):
+    app = make_app(['a', 'b'])
+    client = app.test_client()
+    i = 0
+    while True:
+        i += 1
+        res = client.post('/api/auth/signup', json={
+            "user_name": f"User {i}",
+            "user_email": f"moving{i}@example.com",
+            "password": "test1234",
+            "confirm_password": "test1234"
+        })
+        data = res.get_json()
+        if GROWN_RING.node_for(data['user']['user_id']) == 'c':
+            break
+    user_id = data['user']['user_id']
+    headers = {'Authorization': f"Bearer {data['access_token']}"}
+    note_ids = [
+        client.post('/api/notes', headers=headers, json={"note_title": f"N{j}"}).get_json()['note']['note_id']
+        for j in range(3)
+    ]
+
+    # Requests are served by a separate app, as another worker would.
+    client = make_app(['a', 'b', 'c'], previous=['a', 'b']).test_client()
+    copy_rows = resharding._copy_rows
+
+    def copy_then_use(*args, **kwargs):
+        moved = copy_rows(*args, **kwargs)
+        # Copied but not switched yet: the user still sees and edits everything.
+        assert sorted(n['note_title'] for n in _notes(client, headers)) == ['N0', 'N1', 'N2']
+        res = client.put(f'/api/notes/{note_ids[0]}', headers=headers, json={"note_title": "Edited"})
+        assert res.status_code == 200
+        assert client.delete(f'/api/notes/{note_ids[1]}', headers=headers).status_code == 200
+        assert client.post('/api/notes', headers=headers, json={"note_title": "N3"}).status_code == 201
+        return moved
+
+    monkeypatch.setattr(resharding, '_copy_rows', copy_then_use)
+    app = make_app(['a', 'b', 'c'], previous=['a', 'b'])
+    with app.app_context():
+        users_moved, _ = rebalance_shards(batch_size=1, user_ids={user_id})
+    assert users_moved == 1
+
+    assert set(_note_owners(tmp_path, 'c')) == {user_id}
+    assert user_id not in _note_owners(tmp_path, 'a') + _note_owners(tmp_path, 'b')
+    assert sorted(n['note_title'] for n in _notes(client, headers)) == ['Edited', 'N2', 'N3']
+    assert client.get('/api/notes/stats', headers=headers).get_json()['stats']['note_count'] == 3
+    revisions = client.get(f'/api/notes/{note_ids[0]}/revisions', headers=headers).get_json()['revisions']
+    assert revisions[0]['note_title'] == 'Edited'
+
+
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA foreign_keys = ON")
+
+
+def test_draining_a_source_with_foreign_keys_keeps_revisions(make_app, tmp_path):
+    # Like MySQL, enforce note_revisions -> notes ON DELETE CASCADE on the source.
+    event.listen(Engine, 'connect', _enforce_foreign_keys)
+    try:
+        app = make_app([])
+        client = app.test_client()
+        res = client.post('/api/auth/signup', json={
+            "user_name": "Unsharded",
+            "user_email": "unsharded@example.com",
+            "password": "test1234",
+            "confirm_password": "test1234"
+        })
+        headers = {'Authorization': f"Bearer {res.get_json()['access_token']}"}
+        note_id = client.post('/api/notes', headers=headers, json={"note_title": "T", "note_content": "v1"}).get_json()['note']['note_id']
+        for i in (2, 3, 4):
+            client.put(f'/api/notes/{note_id}', headers=headers, json={"note_content": f"v{i}"})
+
+        app = make_app(['a', 'b'])
+        client = app.test_client()
+        with app.app_context():
+            users_moved, rows_moved = rebalance_shards(batch_size=2, drain={'main': f"sqlite:///{tmp_path / 'main.db'}"})
+    finally:
+        event.remove(Engine, 'connect', _enforce_foreign_keys)
+
+    # The note and its four revisions.
+    assert (users_moved, rows_moved) == (1, 5)
+    revisions = client.get(f'/api/notes/{note_id}/revisions', headers=headers).get_json()['revisions']
+    assert [r['revision_no'] for r in revisions] == [4, 3, 2, 1]
+    res = client.get(f'/api/notes/{note_id}/revisions/1', headers=headers)
+    assert res.get_json()['revision']['note_content'] == "v1"
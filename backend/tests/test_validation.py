@@ -0,0 +1,57 @@
+import pytest
+
+
+@pytest.fixture
+def headers(client):
+    res = client.post('/api/auth/signup', json={
+        "user_name": "Validator",
+        "user_email": "validator@example.com",
+        "password": "test1234",
+        "confirm_password": "test1234"
+    })
+    return {'Authorization': f"Bearer {res.get_json()['access_token']}"}
+
+
+@pytest.mark.parametrize('body', ['[]', 'null', '"note"', '{bad json', ''])
+def test_non_object_body_is_rejected(client, headers, body):
+    res = client.post('/api/notes', headers=headers, data=body, content_type='application/json')
+    assert res.status_code == 400
+    assert res.get_json()['error'] == 'Validation failed'
+
+
+def test_validation_errors_are_reported(client):
+    res = client.post('/api/auth/signup', json={
+        "user_name": "Test",
+        "user_email": "not-an-email",
+        "password": "test1234",
+        "confirm_password": "test1234"
+    })
+    assert res.status_code == 400
+    assert res.get_json()['details'][0]['loc'] == ['user_email']
+
+
+def test_validation_errors_do_not_echo_the_input(client):
+    res = client.post('/api/auth/signup', json={
+        "user_name": "Test",
+        "user_email": "echo@example.com",
+        "password": "secret1",
+        "confirm_password": "secret2"
+    })
+    assert res.status_code == 400
+    assert 'secret' not in res.get_data(as_text=True)
+    assert all('input' not in error for error in res.get_json()['details'])
+
+
+def test_non_json_body_is_rejected(client, headers):
+    res = client.post('/api/notes', headers=headers, data='{"note_title": "Plain"}', content_type='text/plain')
+    assert res.status_code == 415
+    assert res.get_json()['error'] == 'Unsupported Media Type'
+
+
+def test_oversized_body_is_rejected(app, client, headers):
+    limit = app.config['MAX_JSON_BODY_SIZE']
+    res = client.post('/api/notes', headers=headers, json={
+        "note_title": "Big",
+        "note_content": "x" * limit
+    })
+    assert res.status_code == 413